@@ -1,4 +1,5 @@
 from agents.BaseAgent import BaseAgent
+from mcpi.edits import EditBatch
 import asyncio
 import logging
 
@@ -91,10 +92,13 @@ class BuilderBot(BaseAgent):
         """Mètode ASÍNCRON obligatori."""
         if self.state == "RUNNING":
             plan = self.blueprints.get(self.selected_blueprint, [])
-            for b in plan:
-                # Col·loquem el bloc
-                self.mc.setBlock(self.build_x + b[0], self.build_y + b[1], self.build_z + b[2], b[3])
-                await asyncio.sleep(0.1)
+            # Els blocs del plànol s'agrupen en cuboides del mateix material:
+            # un setBlocks per cuboide en lloc d'un setBlock per bloc. Només
+            # s'envien els blocs que canvien: reconstruir o reprendre és gratuït
+            with EditBatch(self.mc, diff=True) as batch:
+                for b in plan:
+                    batch.setBlock(self.build_x + b[0], self.build_y + b[1], self.build_z + b[2], b[3])
+            await asyncio.sleep(0)
             
             self.mc.postToChat("Construcció acabada!")
             self.transition_to("IDLE")
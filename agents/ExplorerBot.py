@@ -61,11 +61,13 @@ class ExplorerBot(BaseAgent):
         grid = [(x, z) for x in range(x_start, x_start + size) 
                         for z in range(z_start, z_start + size)]
         
-        # 2. Obtenim les altures amb map, però ara guardem també la referència Y
+        # 2. Obtenim les altures amb map, però ara guardem també la referència Y.
+        # getHeights llegeix tota la rejilla de cop (les columnes ja conegudes surten de la cache)
+        heightmap = self.mc.getHeights(x_start, z_start, x_start + size - 1, z_start + size - 1)
         terrain_data = list(map(lambda pos: {
             'x': pos[0], 
             'z': pos[1], 
-            'y': self.mc.getHeight(pos[0], pos[1])
+            'y': heightmap.getHeight(pos[0], pos[1])
         }, grid))
         
         # 3. Filtrem zones segures o d'interès respecte a la Y demanada
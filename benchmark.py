@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Afegeix la carpeta actual al path per a que trobi 'agents', 'strategies', etc.
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mcpi.connection import Connection
+from mcpi.minecraft import Minecraft
+from mcpi.localserver import LocalServer, World, hillyTerrain
+from mcpi.pool import ConnectionPool
+from mcpi.replay import Recorder, ReplayConnection
+from mcpi.stats import ConnectionStats
+from missatges.messageBus import MessageBus
+from agents.ExplorerBot import ExplorerBot
+from agents.MinerBot import MinerBot
+from agents.BuilderBot import BuilderBot
+from strategies.Vertical import VerticalMining
+
+# Benchmark offline dels agents contra el servidor local (mcpi.localserver).
+# Mateix món i mateixa latència a cada execució: els resultats són comparables.
+#
+#   python benchmark.py --latency 0.005 --size 16 --rounds 5 [--json]
+#
+# Amb --record DIR es desa el trànsit de cada agent (DIR/<agent>.mcpi.gz) i amb
+# --replay DIR es torna a executar sense servidor, responent des de la gravació:
+# així es mesura el cost de CPU i el nombre de crides sense soroll de xarxa.
+
+async def run_benchmark(latency, size, rounds, record=None, replay=None):
+    stats = ConnectionStats()
+    # Reproduint una gravació no es parla amb cap servidor
+    server = pool = None
+    if not replay:
+        server = LocalServer(port=0, world=World(hillyTerrain()), latency=latency).start()
+        pool = ConnectionPool("localhost", server.port, size=3, bufferSize=16384, stats=stats)
+    bus = MessageBus()
+    timings = {}
+
+    def connect(agent_id):
+        if replay:
+            return ReplayConnection(os.path.join(replay, agent_id + ".mcpi.gz"), stats=stats)
+        if record:
+            return Connection("localhost", server.port, bufferSize=16384, stats=stats,
+                              recorder=Recorder(os.path.join(record, agent_id + ".mcpi.gz")))
+        return pool.acquire()
+
+    def agent(cls, agent_id):
+        return cls(agent_id=agent_id, mc_connection=Minecraft(connect(agent_id)),
+                   message_bus=bus, input_queue=bus.subscribe(agent_id))
+
+    explorer = agent(ExplorerBot, "ExplorerBot-1")
+    miner = agent(MinerBot, "MinerBot-1")
+    builder = agent(BuilderBot, "BuilderBot-1")
+
+    # 1. ExplorerBot: anàlisi del terreny (getHeight per columna)
+    start = time.perf_counter()
+    await explorer.analyze_terrain(0, 60, 0, size)
+    timings["ExplorerBot.analyze_terrain"] = time.perf_counter() - start
+
+    # 2. MinerBot: rondes de VerticalMining des de la superfície
+    miner.mine_x, miner.mine_y, miner.mine_z = 5, 60, 5
+    strategy = VerticalMining()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        strategy.execute(miner.mc, miner)
+    miner.mc.flush()
+    timings["MinerBot.VerticalMining x%d" % rounds] = time.perf_counter() - start
+
+    # 3. BuilderBot: construcció de tots els plànols
+    start = time.perf_counter()
+    for name in builder.blueprints:
+        builder.selected_blueprint = name
+        builder.build_x, builder.build_y, builder.build_z = 20, 70, 20
+        builder.state = "RUNNING"
+        await builder.act()
+    builder.mc.flush()
+    timings["BuilderBot.act (tots els plànols)"] = time.perf_counter() - start
+
+    for bot in (explorer, miner, builder):
+        if record or replay:
+            bot.mc.conn.close()
+        else:
+            pool.release(bot.mc.conn)
+    if server is None:
+        return timings, stats.snapshot(), 0
+    pool.close()
+    server.stop()
+    return timings, stats.snapshot(), server.requests
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline dels agents")
+    parser.add_argument("--latency", type=float, default=0.002, help="segons afegits a cada resposta")
+    parser.add_argument("--size", type=int, default=16, help="costat de la zona que analitza l'ExplorerBot")
+    parser.add_argument("--rounds", type=int, default=5, help="rondes de VerticalMining")
+    parser.add_argument("--json", action="store_true", help="escriu el resultat en JSON")
+    parser.add_argument("--record", metavar="DIR", help="grava el trànsit de cada agent a DIR")
+    parser.add_argument("--replay", metavar="DIR", help="reprodueix una gravació de DIR, sense servidor")
+    args = parser.parse_args()
+    record = args.record and os.path.abspath(args.record)
+    replay = args.replay and os.path.abspath(args.replay)
+    if record:
+        os.makedirs(record, exist_ok=True)
+
+    # Els agents configuren el logging a INFO en importar-se: aquí només avisos
+    logging.getLogger().setLevel(logging.WARNING)
+    # Els agents guarden checkpoints en cada transició: els deixem en un
+    # directori temporal, que s'esborra en acabar
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="mcpi-bench-") as workdir:
+        os.chdir(workdir)
+        try:
+            timings, snapshot, requests = asyncio.run(
+                run_benchmark(args.latency, args.size, args.rounds, record, replay))
+        finally:
+            os.chdir(cwd)
+
+    if args.json:
+        print(json.dumps({"timings": timings, "requests": requests, "stats": snapshot}, indent=2))
+        return
+    for name, seconds in timings.items():
+        print(f"{name:40s} {seconds * 1000:10.1f} ms")
+    print(f"{'peticions al servidor':40s} {requests:10d}")
+    for command, c in snapshot["commands"].items():
+        print(f"  {command:38s} {c['calls']:8d} crides  p50={c['p50Ms']:.2f}ms p99={c['p99Ms']:.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,11 @@ import pkgutil
 import time
 
 from mcpi.minecraft import Minecraft
+from mcpi.asyncminecraft import AsyncMinecraft
+from mcpi.event import ChatEvent
+from mcpi.pool import ConnectionPool
+from mcpi.cache import BlockCache, HeightCache
+from mcpi.stats import ConnectionStats
 
 # Importem mòduls del projecte
 import agents 
@@ -22,6 +27,18 @@ logger = logging.getLogger("MAIN")
 
 TARGET_MINER_ID = "MinerBot-1"
 
+# Mida del pool de connexions (una per agent). Configurable per entorn.
+POOL_SIZE = int(os.environ.get("MCPI_POOL_SIZE", 0))
+# Les ordres sense resposta (setBlock, postToChat...) s'agrupen en un buffer
+# i s'envien juntes en lloc d'un paquet per bloc
+WRITE_BUFFER_SIZE = 16384
+# Memòria cau de blocs i d'altures compartida pels agents. Els canvis que fa el
+# jugador no es veuen, així que les entrades caduquen al cap d'aquests segons
+BLOCK_CACHE_TTL = 30
+# MCPI_STATS=<segons> activa la instrumentació de la connexió i en registra
+# un resum (crides, bytes, latències p50/p95/p99) cada tants segons
+STATS_INTERVAL = float(os.environ.get("MCPI_STATS", 0))
+
 # --- 2. Parser de Comandes (Lògica de Xat)
 
 def parse_command(chat_message: str):
@@ -53,13 +70,14 @@ def parse_command(chat_message: str):
             params[k] = int(v) if v.isdigit() else v
 
     return agent_name, command, params
-async def chat_listener_loop(mc: Minecraft, bus: MessageBus):
+async def chat_listener_loop(mc: AsyncMinecraft, bus: MessageBus):
     """Bucle asíncron que llegeix el xat de Minecraft i publica al Bus[cite: 33, 152]."""
     logger.info("Iniciant escolta asíncrona...")
-    while True:
-        try:
-            posts = mc.events.pollChatPosts() 
-            for post in posts:
+    try:
+        # Subscripció al flux d'esdeveniments: el sondeig s'espaia quan ningú
+        # escriu i s'accelera quan hi ha activitat, sense bloquejar el bucle
+        async with mc.events.stream().subscribe(ChatEvent) as posts:
+            async for post in posts:
                 # AFEGEIX AIXÒ PER VEURE-HO TOT:
                 print(f"DEBUG XAT REBUT: {post.message}") 
                 
@@ -75,10 +93,23 @@ async def chat_listener_loop(mc: Minecraft, bus: MessageBus):
                         "context": {"source_chat": post.message}
                     }
                     await bus.publish(control_message)
-            await asyncio.sleep(0.1) 
-        except Exception as e:
-            logger.error(f"Error en el listener del xat: {e}")
-            break
+    except Exception as e:
+        logger.error(f"Error en el listener del xat: {e}")
+
+def log_stats(stats: ConnectionStats):
+    snapshot = stats.snapshot()
+    for command, c in snapshot["commands"].items():
+        logger.info(f"STATS {command}: {c['calls']} crides, {c['bytesSent']}B enviats, "
+                    f"{c['bytesReceived']}B rebuts, p50={c['p50Ms']:.2f}ms "
+                    f"p95={c['p95Ms']:.2f}ms p99={c['p99Ms']:.2f}ms")
+    if snapshot["unexpected"]:
+        logger.warning(f"STATS: {snapshot['unexpected']} línies inesperades del servidor")
+
+async def stats_reporter_loop(stats: ConnectionStats):
+    """Registra periòdicament les estadístiques de les connexions."""
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        log_stats(stats)
 
 # --- 3. Descobriment Reflectiu  ---
 
@@ -96,7 +127,6 @@ def discover_agents():
 # --- 4. Main Loop ---
 
 async def main():
-    mc = Minecraft.create() 
     bus = MessageBus()
     agent_classes = discover_agents()
     
@@ -109,9 +139,25 @@ async def main():
         "BuilderBot": "BuilderBot-1"
     }
 
+    # Cada agent rep la seva pròpia connexió del pool: les peticions no es
+    # serialitzen en un únic socket i les respostes no es poden barrejar
+    stats = ConnectionStats() if STATS_INTERVAL > 0 else None
+    # Cada agent reté la seva connexió: un pool més petit que el nombre
+    # d'agents esgotaria les connexions en arrencar
+    pool_size = max(POOL_SIZE, len(mapping))
+    if POOL_SIZE and POOL_SIZE < len(mapping):
+        logger.warning(f"MCPI_POOL_SIZE={POOL_SIZE} és menor que el nombre d'agents, s'usa {pool_size}")
+    pool = ConnectionPool(size=pool_size, bufferSize=WRITE_BUFFER_SIZE, stats=stats)
+    leased = []
+    block_cache = BlockCache(ttl=BLOCK_CACHE_TTL)
+    height_cache = HeightCache(ttl=BLOCK_CACHE_TTL)
+
     for class_name, agent_id in mapping.items():
         if class_name in agent_classes:
             queue = bus.subscribe(agent_id)
+            conn = pool.acquire(timeout=5)
+            leased.append(conn)
+            mc = Minecraft(conn, blockCache=block_cache, heightCache=height_cache)
             agent_inst = agent_classes[class_name](
                 agent_id=agent_id, 
                 mc_connection=mc, 
@@ -121,8 +167,14 @@ async def main():
             active_agents.append(agent_inst)
             tasks.append(asyncio.create_task(agent_inst.run()))
 
-    # Afegim el listener del xat a les tasques asíncrones 
-    tasks.append(asyncio.create_task(chat_listener_loop(mc, bus)))
+    # Afegim el listener del xat a les tasques asíncrones, amb la seva pròpia
+    # connexió asyncio perquè l'escolta no aturi els agents (ni a l'inrevés)
+    chat_mc = await AsyncMinecraft.create()
+    chat_task = asyncio.create_task(chat_listener_loop(chat_mc, bus))
+    tasks.append(chat_task)
+
+    if stats is not None:
+        tasks.append(asyncio.create_task(stats_reporter_loop(stats)))
 
     logger.info("SISTEMA ACTIU: Escoltant xat i agents corrent.")
 
@@ -133,6 +185,15 @@ async def main():
     finally:
         for agent in active_agents:
             agent.handle_control("stop") 
+        # El listener deixa d'escoltar abans de tancar la seva connexió
+        chat_task.cancel()
+        await asyncio.gather(chat_task, return_exceptions=True)
+        await chat_mc.conn.close()
+        for conn in leased:
+            pool.release(conn)
+        pool.close()
+        if stats is not None:
+            log_stats(stats)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
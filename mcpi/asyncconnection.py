@@ -0,0 +1,105 @@
+import asyncio
+import collections
+from .connection import Connection, RequestError
+
+class AsyncConnection:
+    """asyncio connection to a Minecraft Pi game, see Connection"""
+    RequestFailed = Connection.RequestFailed
+    # Longest reply line, a getBlocks of 256x256x16 blocks is ~3 MB
+    ReadLimit = 1 << 26
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.lastSent = ""
+        # Same scheme as Connection: one (future, raw) per expected reply, in
+        # wire order, resolved by a reader task, so many requests can be in flight
+        self._waiting = collections.deque()
+        self.unexpected = 0
+        self._unclaimed = asyncio.Queue(maxsize=Connection.UnclaimedLimit)
+        self._closed = None
+        self._readerTask = asyncio.get_running_loop().create_task(self._readLoop())
+
+    @staticmethod
+    async def open(address = "localhost", port = 4711):
+        reader, writer = await asyncio.open_connection(address, port, limit=AsyncConnection.ReadLimit)
+        return AsyncConnection(reader, writer)
+
+    async def send(self, f, *data):
+        """Sends data, waiting only for the socket buffer (not the server)"""
+        self._write(Connection.encode(f, *data))
+        await self.writer.drain()
+
+    def _write(self, s):
+        if self._closed is not None:
+            raise ConnectionError("Connection is closed") from self._closed
+        self.lastSent = s
+        self.writer.write(s)
+
+    async def _readLoop(self):
+        error = ConnectionError("Connection is closed")
+        try:
+            while True:
+                s = await self.reader.readline()
+                if not s:
+                    raise ConnectionError("Connection closed by the server")
+                if self._waiting:
+                    future, raw = self._waiting.popleft()
+                    if not future.cancelled():
+                        future.set_result(s[:-1] if raw else s.decode("cp437").rstrip("\n"))
+                else:
+                    line = s.decode("cp437").rstrip("\n")
+                    self.unexpected += 1
+                    if self._unclaimed.full():
+                        self._unclaimed.get_nowait()
+                    self._unclaimed.put_nowait(line)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # also a line longer than ReadLimit (ValueError): the stream is lost
+            error = e
+        finally:
+            # whatever ends the reader, nobody is left waiting for a reply
+            self._closed = error
+            while self._waiting:
+                future, _ = self._waiting.popleft()
+                if not future.done():
+                    future.set_exception(error)
+            if self._unclaimed.full():
+                self._unclaimed.get_nowait()
+            self._unclaimed.put_nowait(error)
+
+    async def receive(self):
+        """Receives a line no request was waiting for (see Connection.receive)"""
+        s = await self._unclaimed.get()
+        if isinstance(s, BaseException):
+            # the connection is closed, for every later call too
+            self._unclaimed.put_nowait(s)
+            raise ConnectionError("Connection is closed") from s
+        if s == AsyncConnection.RequestFailed:
+            raise RequestError("%s failed"%self.lastSent.strip())
+        return s
+
+    async def sendReceive(self, *data, raw=False):
+        """Sends and receive data, raw=True returns the reply as bytes"""
+        s = Connection.encode(*data)
+        future = asyncio.get_running_loop().create_future()
+        self._write(s)
+        self._waiting.append((future, raw))
+        await self.writer.drain()
+        reply = await future
+        if reply == AsyncConnection.RequestFailed or reply == Connection.RawRequestFailed:
+            raise RequestError("%s failed"%s.strip())
+        return reply
+
+    async def close(self):
+        self.writer.close()
+        self._readerTask.cancel()
+        try:
+            await self._readerTask
+        except asyncio.CancelledError:
+            pass
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
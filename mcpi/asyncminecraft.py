@@ -0,0 +1,218 @@
+from .asyncconnection import AsyncConnection
+import asyncio
+from .minecraft import intFloor, _parseBlock, _parseBlockHits, _parseChatPosts, _wants
+from .event import BlockEvent, ChatEvent
+from .vec3 import Vec3
+from .eventstream import EventStream
+from .region import Region, parseIds
+
+""" asyncio version of the Minecraft PI low level api.
+
+    Every method that talks to the server is a coroutine with the same name
+    and arguments as its counterpart in mcpi.minecraft, so an agent can
+    await world access without stalling the event loop:
+
+        mc = await AsyncMinecraft.create()
+        height = await mc.getHeight(0, 0)
+"""
+
+class AsyncCmdPositioner:
+    """Methods for setting and getting positions"""
+    def __init__(self, connection, packagePrefix):
+        self.conn = connection
+        self.pkg = packagePrefix
+
+    async def getPos(self, id):
+        """Get entity position (entityId:int) => Vec3"""
+        s = await self.conn.sendReceive(self.pkg + b".getPos", id)
+        return Vec3(*list(map(float, s.split(","))))
+
+    async def setPos(self, id, *args):
+        """Set entity position (entityId:int, x,y,z)"""
+        await self.conn.send(self.pkg + b".setPos", id, args)
+
+    async def getTilePos(self, id):
+        """Get entity tile position (entityId:int) => Vec3"""
+        s = await self.conn.sendReceive(self.pkg + b".getTile", id)
+        return Vec3(*list(map(int, s.split(","))))
+
+    async def setTilePos(self, id, *args):
+        """Set entity tile position (entityId:int) => Vec3"""
+        await self.conn.send(self.pkg + b".setTile", id, intFloor(*args))
+
+    async def getDirection(self, id):
+        """Get entity direction (entityId:int) => Vec3"""
+        s = await self.conn.sendReceive(self.pkg + b".getDirection", id)
+        return Vec3(*map(float, s.split(",")))
+
+    async def getRotation(self, id):
+        """get entity rotation (entityId:int) => float"""
+        return float(await self.conn.sendReceive(self.pkg + b".getRotation", id))
+
+    async def getPitch(self, id):
+        """get entity pitch (entityId:int) => float"""
+        return float(await self.conn.sendReceive(self.pkg + b".getPitch", id))
+
+    async def setting(self, setting, status):
+        """Set a player setting (setting, status). keys: autojump"""
+        await self.conn.send(self.pkg + b".setting", setting, 1 if bool(status) else 0)
+
+
+class AsyncCmdEntity(AsyncCmdPositioner):
+    """Methods for entities"""
+    def __init__(self, connection):
+        AsyncCmdPositioner.__init__(self, connection, b"entity")
+
+
+class AsyncCmdPlayer(AsyncCmdPositioner):
+    """Methods for the host (Raspberry Pi) player"""
+    def __init__(self, connection):
+        AsyncCmdPositioner.__init__(self, connection, b"player")
+        self.conn = connection
+
+    async def getPos(self):
+        return await AsyncCmdPositioner.getPos(self, [])
+    async def setPos(self, *args):
+        return await AsyncCmdPositioner.setPos(self, [], args)
+    async def getTilePos(self):
+        return await AsyncCmdPositioner.getTilePos(self, [])
+    async def setTilePos(self, *args):
+        return await AsyncCmdPositioner.setTilePos(self, [], args)
+    async def getDirection(self):
+        return await AsyncCmdPositioner.getDirection(self, [])
+    async def getRotation(self):
+        return await AsyncCmdPositioner.getRotation(self, [])
+    async def getPitch(self):
+        return await AsyncCmdPositioner.getPitch(self, [])
+
+class AsyncCmdCamera:
+    def __init__(self, connection):
+        self.conn = connection
+
+    async def setNormal(self, *args):
+        """Set camera mode to normal Minecraft view ([entityId])"""
+        await self.conn.send(b"camera.mode.setNormal", args)
+
+    async def setFixed(self):
+        """Set camera mode to fixed view"""
+        await self.conn.send(b"camera.mode.setFixed")
+
+    async def setFollow(self, *args):
+        """Set camera mode to follow an entity ([entityId])"""
+        await self.conn.send(b"camera.mode.setFollow", args)
+
+    async def setPos(self, *args):
+        """Set camera entity position (x,y,z)"""
+        await self.conn.send(b"camera.setPos", args)
+
+
+class AsyncCmdEvents:
+    """Events"""
+    def __init__(self, connection):
+        self.conn = connection
+        self._stream = None
+
+    async def clearAll(self):
+        """Clear all old events"""
+        await self.conn.send(b"events.clear")
+
+    async def pollBlockHits(self):
+        """Only triggered by sword => [BlockEvent]"""
+        s = await self.conn.sendReceive(b"events.block.hits")
+        return _parseBlockHits(s)
+
+    async def pollChatPosts(self):
+        """Triggered by posts to chat => [ChatEvent]"""
+        s = await self.conn.sendReceive(b"events.chat.posts")
+        return _parseChatPosts(s)
+
+    async def pollAll(self, types=None):
+        """Chat posts and block hits, both requests in flight at once => [ChatEvent|BlockEvent]
+
+        types, e.g. (ChatEvent,), polls only those (see CmdEvents.pollAll)"""
+        polls = []
+        if _wants(types, ChatEvent):
+            polls.append(self.pollChatPosts())
+        if _wants(types, BlockEvent):
+            polls.append(self.pollBlockHits())
+        return [event for events in await asyncio.gather(*polls) for event in events]
+
+    def stream(self):
+        """The EventStream of chat posts and block hits => EventStream"""
+        if self._stream is None:
+            self._stream = EventStream(self.pollAll)
+        return self._stream
+
+class AsyncMinecraft:
+    """asyncio counterpart of Minecraft, all server calls are awaitable."""
+    def __init__(self, connection):
+        self.conn = connection
+
+        self.camera = AsyncCmdCamera(connection)
+        self.entity = AsyncCmdEntity(connection)
+        self.player = AsyncCmdPlayer(connection)
+        self.events = AsyncCmdEvents(connection)
+
+    async def getBlock(self, *args):
+        """Get block (x,y,z) => id:int"""
+        return int(await self.conn.sendReceive(b"world.getBlock", intFloor(args)))
+
+    async def getBlockWithData(self, *args):
+        """Get block with data (x,y,z) => Block"""
+        ans = await self.conn.sendReceive(b"world.getBlockWithData", intFloor(args))
+        return _parseBlock(ans)
+
+    async def getBlocks(self, *args):
+        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) => array('H') of ids"""
+        return parseIds(await self.conn.sendReceive(b"world.getBlocks", intFloor(args), raw=True))
+
+    async def getRegion(self, *args, withData=False):
+        """Get a cuboid of blocks in one round trip (x0,y0,z0,x1,y1,z1) => Region
+
+        withData=True also reads the data values (world.getBlocksWithData)"""
+        corners = intFloor(args)
+        if withData:
+            s = await self.conn.sendReceive(b"world.getBlocksWithData", corners, raw=True)
+            return Region.parseWithData(*corners, s)
+        return Region.parse(*corners, await self.conn.sendReceive(b"world.getBlocks", corners, raw=True))
+
+    async def setBlock(self, *args):
+        """Set block (x,y,z,id,[data])"""
+        await self.conn.send(b"world.setBlock", intFloor(args))
+
+    async def setBlocks(self, *args):
+        """Set a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data])"""
+        await self.conn.send(b"world.setBlocks", intFloor(args))
+
+    async def getHeight(self, *args):
+        """Get the height of the world (x,z) => int"""
+        return int(await self.conn.sendReceive(b"world.getHeight", intFloor(args)))
+
+    async def getPlayerEntityIds(self):
+        """Get the entity ids of the connected players => [id:int]"""
+        ids = await self.conn.sendReceive(b"world.getPlayerIds")
+        return list(map(int, ids.split("|")))
+
+    async def getPlayerEntityId(self, name):
+        """Get the entity id of the named player => [id:int]"""
+        return int(await self.conn.sendReceive(b"world.getPlayerId", name))
+
+    async def saveCheckpoint(self):
+        """Save a checkpoint that can be used for restoring the world"""
+        await self.conn.send(b"world.checkpoint.save")
+
+    async def restoreCheckpoint(self):
+        """Restore the world state to the checkpoint"""
+        await self.conn.send(b"world.checkpoint.restore")
+
+    async def postToChat(self, msg):
+        """Post a message to the game chat"""
+        await self.conn.send(b"chat.post", msg)
+
+    async def setting(self, setting, status):
+        """Set a world setting (setting, status). keys: world_immutable, nametags_visible"""
+        await self.conn.send(b"world.setting", setting, 1 if bool(status) else 0)
+
+    @staticmethod
+    async def create(address = "localhost", port = 4711):
+        return AsyncMinecraft(await AsyncConnection.open(address, port))
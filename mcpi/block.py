@@ -1,8 +1,29 @@
 class Block:
-    """Minecraft PI block description. Can be sent to Minecraft.setBlock/s"""
-    def __init__(self, id, data=0):
-        self.id = id
-        self.data = data
+    """Minecraft PI block description. Can be sent to Minecraft.setBlock/s
+
+    Blocks are immutable and interned: Block(id, data) returns one shared
+    instance per (id, data), so lists of blocks cost a pointer per item."""
+    __slots__ = ("id", "data")
+    _interned = {}
+    # bound on the interned pairs, further blocks are created as usual
+    MaxInterned = 65536
+
+    def __new__(cls, id, data=0):
+        key = (cls, id, data)
+        block = Block._interned.get(key)
+        if block is None:
+            block = object.__new__(cls)
+            object.__setattr__(block, "id", id)
+            object.__setattr__(block, "data", data)
+            if len(Block._interned) < Block.MaxInterned:
+                Block._interned[key] = block
+        return block
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Block is immutable, use withData()")
+
+    def __reduce__(self):
+        return (type(self), (self.id, self.data))
 
     def __cmp__(self, rhs):
         return hash(self) - hash(rhs)
@@ -0,0 +1,251 @@
+import collections
+import threading
+import time
+from array import array
+
+class BlockCache:
+    """
+    Bounded cache of world blocks, for Minecraft(connection, blockCache=...).
+
+    Blocks are grouped in 16x16x16 chunks and the least recently used chunk
+    is evicted once there are more than maxChunks. Reads fill it (read
+    through) and writes update it (write through), so it can be shared by
+    several Minecraft objects, e.g. one per agent. Changes made by players
+    are not seen: give a ttl (seconds) to let chunks expire, or call
+    invalidate()/clear().
+
+    Every write stamps its chunks. A read takes mark() before it is sent
+    and fills with since=mark: a chunk written while the reply was on its
+    way keeps the newer block instead of the stale reply.
+    """
+    ChunkSize = 16
+    # setBlocks larger than this invalidate their chunks instead of filling them
+    MaxCuboidFill = 4096
+    # larger prefetched regions are not copied into the cache
+    MaxRegionFill = 65536
+
+    def __init__(self, maxChunks=256, ttl=None):
+        self.maxChunks = maxChunks
+        self.ttl = ttl
+        self.chunks = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # write stamp of each chunk, and the newest one of the chunks dropped
+        self._writes = 0
+        self._stamps = {}
+        self._lostStamp = 0
+
+    @staticmethod
+    def chunkOf(x, y, z):
+        s = BlockCache.ChunkSize
+        return (x // s, y // s, z // s)
+
+    def _chunk(self, key, create):
+        """The blocks of chunk key, most recently used, or None (lock held)"""
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            if self.ttl is not None and time.monotonic() - chunk[0] > self.ttl:
+                self._drop(key)
+                chunk = None
+            else:
+                self.chunks.move_to_end(key)
+        if chunk is None and create:
+            chunk = self.chunks[key] = (time.monotonic(), {})
+            # it may have been written before it was dropped
+            self._stamps[key] = self._lostStamp
+            if len(self.chunks) > self.maxChunks:
+                self._drop(next(iter(self.chunks)))
+        return chunk[1] if chunk is not None else None
+
+    def _drop(self, key):
+        """Forgets chunk key (lock held)"""
+        del self.chunks[key]
+        self._lostStamp = max(self._lostStamp, self._stamps.pop(key, 0))
+
+    def _stamp(self, key):
+        """Marks chunk key as written now (lock held)"""
+        self._writes += 1
+        self._stamps[key] = self._writes
+
+    def _stale(self, key, since):
+        """A fill read at since is older than the last write of chunk key (lock held)"""
+        if since is None:
+            return False
+        return self._stamps.get(key, self._lostStamp) > since
+
+    def mark(self):
+        """The write stamp to pass as since to the fills of a read sent now"""
+        with self._lock:
+            return self._writes
+
+    def get(self, x, y, z, withData=False):
+        """=> (id, data) with data None if only the id is known, or None.
+        withData=True only accepts blocks whose data is known."""
+        with self._lock:
+            blocks = self._chunk(BlockCache.chunkOf(x, y, z), False)
+            known = blocks.get((x, y, z)) if blocks is not None else None
+            if withData and known is not None and known[1] is None:
+                known = None
+            if known is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return known
+
+    def put(self, x, y, z, id, data=None, since=None):
+        """Stores a block, data None keeps a known data value of the same id.
+        since (see mark()) makes it the fill of a read, not a write."""
+        key = BlockCache.chunkOf(x, y, z)
+        with self._lock:
+            if self._stale(key, since):
+                return
+            blocks = self._chunk(key, True)
+            if since is None:
+                self._stamp(key)
+            if data is None:
+                known = blocks.get((x, y, z))
+                if known is not None and known[0] == id:
+                    return
+            blocks[(x, y, z)] = (id, data)
+
+    def putCuboid(self, x0, y0, z0, x1, y1, z1, id, data=None):
+        """Stores a cuboid of one block type, or forgets it when too large"""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) * (z1 - z0 + 1) > BlockCache.MaxCuboidFill:
+            self.invalidateCuboid(x0, y0, z0, x1, y1, z1)
+            return
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                for z in range(z0, z1 + 1):
+                    self.put(x, y, z, id, data)
+
+    def putRegion(self, region, since=None):
+        """Stores the blocks of a mcpi.region.Region, with data if it has them,
+        except in the chunks written after since (see mark())"""
+        if len(region.ids) > BlockCache.MaxRegionFill:
+            return
+        data = region.data
+        with self._lock:
+            key = blocks = None
+            for i, (pos, id) in enumerate(region):
+                chunkKey = BlockCache.chunkOf(*pos)
+                if chunkKey != key:
+                    key = chunkKey
+                    blocks = None if self._stale(key, since) else self._chunk(key, True)
+                if blocks is None:
+                    continue
+                if data is not None:
+                    blocks[pos] = (id, data[i])
+                    continue
+                known = blocks.get(pos)
+                if known is None or known[0] != id:
+                    blocks[pos] = (id, None)
+
+    def invalidate(self, x, y, z):
+        key = BlockCache.chunkOf(x, y, z)
+        with self._lock:
+            blocks = self._chunk(key, False)
+            if blocks is not None:
+                self._stamp(key)
+                blocks.pop((x, y, z), None)
+            else:
+                self._writes += 1
+                self._lostStamp = self._writes
+
+    def invalidateCuboid(self, x0, y0, z0, x1, y1, z1):
+        """Drops every chunk overlapping the cuboid"""
+        c0 = BlockCache.chunkOf(min(x0, x1), min(y0, y1), min(z0, z1))
+        c1 = BlockCache.chunkOf(max(x0, x1), max(y0, y1), max(z0, z1))
+        with self._lock:
+            for key in [key for key in self.chunks
+                        if all(c0[i] <= key[i] <= c1[i] for i in range(3))]:
+                self._drop(key)
+            # reads of the cuboid in flight must not fill it again
+            self._writes += 1
+            self._lostStamp = self._writes
+
+    def clear(self):
+        with self._lock:
+            self.chunks.clear()
+            self._stamps.clear()
+            self._writes += 1
+            self._lostStamp = self._writes
+
+class HeightCache:
+    """
+    Cache of column heights, for Minecraft(connection, heightCache=...).
+
+    Heights are stored in 16x16 tiles of array('h'), least recently used
+    tiles are evicted beyond maxTiles. setBlock/s through the Minecraft
+    object forget the heights of the columns they touch; as with BlockCache,
+    a ttl (seconds) covers changes made by players.
+    """
+    TileSize = 16
+    Unknown = -32768
+
+    def __init__(self, maxTiles=1024, ttl=None):
+        self.maxTiles = maxTiles
+        self.ttl = ttl
+        self.tiles = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _locate(x, z):
+        s = HeightCache.TileSize
+        return (x // s, z // s), (x % s) * s + (z % s)
+
+    def _tile(self, key, create):
+        """The heights of tile key, most recently used, or None (lock held)"""
+        tile = self.tiles.get(key)
+        if tile is not None:
+            if self.ttl is not None and time.monotonic() - tile[0] > self.ttl:
+                del self.tiles[key]
+                tile = None
+            else:
+                self.tiles.move_to_end(key)
+        if tile is None and create:
+            heights = array("h", [HeightCache.Unknown]) * (HeightCache.TileSize ** 2)
+            tile = self.tiles[key] = (time.monotonic(), heights)
+            if len(self.tiles) > self.maxTiles:
+                self.tiles.popitem(last=False)
+        return tile[1] if tile is not None else None
+
+    def get(self, x, z):
+        """=> height:int or None"""
+        key, i = HeightCache._locate(x, z)
+        with self._lock:
+            heights = self._tile(key, False)
+            h = heights[i] if heights is not None else HeightCache.Unknown
+            if h == HeightCache.Unknown:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return h
+
+    def put(self, x, z, height):
+        key, i = HeightCache._locate(x, z)
+        with self._lock:
+            self._tile(key, True)[i] = height
+
+    def invalidate(self, x, z):
+        """Forgets the height of column (x,z)"""
+        key, i = HeightCache._locate(x, z)
+        with self._lock:
+            heights = self._tile(key, False)
+            if heights is not None:
+                heights[i] = HeightCache.Unknown
+
+    def invalidateArea(self, x0, z0, x1, z1):
+        """Forgets the heights of every column of the rectangle"""
+        for x in range(min(x0, x1), max(x0, x1) + 1):
+            for z in range(min(z0, z1), max(z0, z1) + 1):
+                self.invalidate(x, z)
+
+    def clear(self):
+        with self._lock:
+            self.tiles.clear()
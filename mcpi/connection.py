@@ -1,7 +1,10 @@
+import collections
 import socket
-import select
-import sys
+import threading
+import time
+from concurrent.futures import Future
 from .util import flatten_parameters_to_bytestring
+from .stats import commandName
 
 """ @author: Aron Nieminen, Mojang AB"""
 
@@ -11,22 +14,64 @@ class RequestError(Exception):
 class Connection:
     """Connection to a Minecraft Pi game"""
     RequestFailed = "Fail"
+    RawRequestFailed = b"Fail"
+    ReadSize = 65536
+    UnclaimedLimit = 64
 
-    def __init__(self, address, port):
+    def __init__(self, address, port, bufferSize=0, flushInterval=0.01, stats=None, recorder=None):
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Writes are coalesced here, Nagle would only delay the requests
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.socket.connect((address, port))
+        self._setup(bufferSize, flushInterval, stats, recorder)
+        self._reader = threading.Thread(target=self._readLoop, daemon=True,
+                                        name="mcpi-reader")
+        self._reader.start()
+
+    def _setup(self, bufferSize, flushInterval, stats, recorder):
+        """Initialises the state shared by every transport"""
+        # Write buffer for commands without a reply (setBlock, postToChat...).
+        # bufferSize=0 sends every command straight away. Otherwise it is
+        # flushed when full, after flushInterval seconds, before any request
+        # that expects a reply and on flush()/close().
+        self.bufferSize = bufferSize
+        self.flushInterval = flushInterval
+        self._wbuf = bytearray()
+        self._wlock = threading.RLock()
+        self._timer = None
+        # Replies are read by a background thread. Every request that expects
+        # a reply queues (Future, raw) here (in wire order, under _wlock) and
+        # the reader resolves them in the order the lines arrive, with the
+        # decoded line or, if raw, its bytes.
+        self._waiting = collections.deque()
+        # Lines nobody was waiting for: counted, and kept for receive()
+        self.unexpected = 0
+        self._unclaimed = collections.deque(maxlen=Connection.UnclaimedLimit)
+        self._unclaimedCond = threading.Condition()
+        self._closed = None
+        # Optional mcpi.stats.ConnectionStats, None keeps the hot path bare
+        self.stats = stats
+        # Optional mcpi.replay.Recorder of the wire traffic
+        self.recorder = recorder
         self.lastSent = ""
 
     def drain(self):
-        """Drains the socket of incoming data"""
-        while True:
-            readable, _, _ = select.select([self.socket], [], [], 0.0)
-            if not readable:
-                break
-            data = self.socket.recv(1500)
-            e =  "Drained Data: <%s>\n"%data.strip()
-            e += "Last Message: <%s>\n"%self.lastSent.strip()
-            sys.stderr.write(e)
+        """Discards the lines nobody was waiting for => int (how many)"""
+        with self._unclaimedCond:
+            n = len(self._unclaimed)
+            self._unclaimed.clear()
+        return n
+
+    # b"command(" for each command encoded so far
+    _prefixes = {}
+
+    @staticmethod
+    def encode(f, *data):
+        """Encodes a command and its arguments as one protocol line"""
+        prefix = Connection._prefixes.get(f)
+        if prefix is None:
+            prefix = Connection._prefixes[f] = f + b"("
+        return prefix + flatten_parameters_to_bytestring(data) + b")\n"
 
     def send(self, f, *data):
         """
@@ -36,28 +81,272 @@ class Connection:
         which is mildly distressing as it can't encode all of Unicode.
         """
 
-        s = b"".join([f, b"(", flatten_parameters_to_bytestring(data), b")", b"\n"])
+        s = Connection.encode(f, *data)
+
+        if self.bufferSize:
+            self._buffer(s)
+        else:
+            with self._wlock:
+                self._checkOpen()
+                self._send(s)
+
+    def _checkOpen(self):
+        """Raises the error that closed the connection, if any (_wlock held)"""
+        if self._closed is not None:
+            raise ConnectionError("Connection is closed") from self._closed
+
+    def _buffer(self, s):
+        with self._wlock:
+            self._checkOpen()
+            self._wbuf += s
+            self.lastSent = s
+            if len(self._wbuf) >= self.bufferSize:
+                self.flush()
+            elif self._timer is None and self.flushInterval:
+                self._timer = threading.Timer(self.flushInterval, self._timedFlush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _takeBuffer(self):
+        """Empties the write buffer => bytes"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        s = bytes(self._wbuf)
+        del self._wbuf[:]
+        return s
+
+    def flush(self):
+        """Sends the buffered commands now"""
+        with self._wlock:
+            s = self._takeBuffer()
+            if s:
+                self._send(s)
 
-        self._send(s)
+    def _timedFlush(self):
+        """flush() on the timer thread, where nobody would see a socket error:
+        it closes the connection and the next send raises it"""
+        try:
+            self.flush()
+        except OSError as e:
+            self._shutdown(e)
 
-    def _send(self, s):
+    def _sendRequest(self, s, requests, raw=()):
+        """
+        Sends s, preceded by the buffered commands. requests are the lines
+        of s that expect a reply => [Future] resolved with the replies, in order.
+        raw flags, per request, the replies wanted as bytes rather than str
+        """
+        futures = [Future() for _ in requests]
+        raw = list(raw) + [False] * (len(requests) - len(raw))
+        if self.stats is not None:
+            self._timeReplies(futures, requests)
+        if self.recorder is not None:
+            self.recorder.watch(futures)
+        with self._wlock:
+            self._checkOpen()
+            pending = self._takeBuffer()
+            # register before writing: the reply may arrive before sendall returns
+            self._waiting.extend(zip(futures, raw))
+            self._send(pending + s if pending else s, requests)
+            self.lastSent = s
+        return futures
+
+    def _timeReplies(self, futures, requests):
+        stats = self.stats
+        sentAt = time.perf_counter()
+        def replied(future, name):
+            # runs on the reader thread as soon as the reply line arrives
+            if future.exception() is None:
+                stats.replied(name, future.result(), time.perf_counter() - sentAt)
+        for future, request in zip(futures, requests):
+            future.add_done_callback(lambda f, name=commandName(request): replied(f, name))
+
+    def _send(self, s, requests=()):
         """
         The actual socket interaction from self.send, extracted for easier mocking
-        and testing
+        and testing. requests are the lines of s that expect a reply
         """
-        self.drain()
         self.lastSent = s
 
+        if self.recorder is not None:
+            self.recorder.sent(s, requests)
         self.socket.sendall(s)
+        if self.stats is not None:
+            self.stats.sent(s)
+
+    def _readLoop(self):
+        """Reader thread: splits the incoming stream into lines and hands them out"""
+        chunk = memoryview(bytearray(Connection.ReadSize))
+        rbuf = bytearray()
+        try:
+            while True:
+                n = self.socket.recv_into(chunk)
+                if n == 0:
+                    raise ConnectionError("Connection closed by the server")
+                start = len(rbuf)
+                rbuf += chunk[:n]
+                end = rbuf.find(b"\n", start)
+                if end < 0:
+                    continue
+                begin = 0
+                while end >= 0:
+                    self._dispatch(rbuf[begin:end])
+                    begin = end + 1
+                    end = rbuf.find(b"\n", begin)
+                del rbuf[:begin]
+        except OSError as e:
+            self._shutdown(e)
 
-    def receive(self):
-        """Receives data. Note that the trailing newline '\n' is trimmed"""
-        s = self.socket.makefile("r").readline().rstrip("\n")
+    def _dispatch(self, line):
+        if self._waiting:
+            future, raw = self._waiting.popleft()
+            # bulk replies (getBlocks) are parsed from the bytes, the rest decoded once
+            future.set_result(bytes(line) if raw else line.decode("cp437"))
+        else:
+            line = line.decode("cp437")
+            if self.stats is not None:
+                self.stats.unexpectedLine()
+            with self._unclaimedCond:
+                self.unexpected += 1
+                self._unclaimed.append(line)
+                self._unclaimedCond.notify()
+
+    def _shutdown(self, e):
+        with self._wlock:
+            self._closed = e
+            while self._waiting:
+                self._waiting.popleft()[0].set_exception(e)
+        with self._unclaimedCond:
+            self._unclaimedCond.notify_all()
+
+    def receive(self, timeout=None):
+        """
+        Receives a line no request was waiting for, e.g. the reply of a command
+        sent with send(). Note that the trailing newline '\n' is trimmed
+        """
+        with self._unclaimedCond:
+            if not self._unclaimedCond.wait_for(
+                    lambda: self._unclaimed or self._closed is not None, timeout):
+                raise TimeoutError("no reply received")
+            if not self._unclaimed:
+                raise ConnectionError("Connection is closed") from self._closed
+            s = self._unclaimed.popleft()
         if s == Connection.RequestFailed:
             raise RequestError("%s failed"%self.lastSent.strip())
         return s
 
-    def sendReceive(self, *data):
-        """Sends and receive data"""
-        self.send(*data)
-        return self.receive()
+    def sendReceive(self, *data, raw=False):
+        """Sends and receive data, raw=True returns the reply as bytes"""
+        s = Connection.encode(*data)
+        reply = self._sendRequest(s, [s], [raw])[0].result()
+        if reply == Connection.RequestFailed or reply == Connection.RawRequestFailed:
+            raise RequestError("%s failed"%s.strip())
+        return reply
+
+    def close(self):
+        """Flushes the buffered commands and closes the socket"""
+        self.flush()
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        self._reader.join()
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def pipeline(self):
+        """Creates a Pipeline that batches requests over this connection"""
+        return Pipeline(self)
+
+
+class Reply:
+    """The pending reply of a request queued in a Pipeline"""
+    def __init__(self, pipeline, request, parse=None, raw=False):
+        self.pipeline = pipeline
+        self.request = request
+        self.parse = parse
+        self.raw = raw
+        self._done = False
+        self._value = None
+        self._error = None
+
+    @staticmethod
+    def of(value):
+        """A Reply that is already resolved, e.g. answered from a cache"""
+        reply = Reply(None, b"")
+        reply._done = True
+        reply._value = value
+        return reply
+
+    def done(self):
+        """True once the reply has been read from the connection"""
+        return self._done
+
+    def result(self):
+        """Returns the (parsed) reply, executing the pipeline if needed"""
+        if not self._done:
+            self.pipeline.execute()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def _resolve(self, s):
+        self._done = True
+        if s == Connection.RequestFailed or s == Connection.RawRequestFailed:
+            self._error = RequestError("%s failed"%self.request.strip())
+        else:
+            self._value = self.parse(s) if self.parse else s
+
+
+class Pipeline:
+    """
+    Queues requests and writes them back to back with a single sendall.
+
+    The server answers requests in the order it receives them, so the replies
+    are read afterwards in that same order. A batch of N queries costs one
+    round trip instead of N. Can be used as a context manager, which executes
+    the queued requests on exit.
+    """
+    def __init__(self, connection):
+        self.conn = connection
+        self._requests = []
+        self._replies = []
+
+    def send(self, f, *data):
+        """Queues a command that has no reply"""
+        self._requests.append(Connection.encode(f, *data))
+
+    def sendReceive(self, f, *data, parse=None, raw=False):
+        """Queues a command with a reply => Reply, parse gets bytes if raw"""
+        request = Connection.encode(f, *data)
+        reply = Reply(self, request, parse, raw)
+        self._requests.append(request)
+        self._replies.append(reply)
+        return reply
+
+    def execute(self):
+        """Sends all queued requests and reads their replies => [result]"""
+        requests, replies = self._requests, self._replies
+        self._requests, self._replies = [], []
+        if requests:
+            futures = self.conn._sendRequest(b"".join(requests), [reply.request for reply in replies],
+                                             [reply.raw for reply in replies])
+            for reply, future in zip(replies, futures):
+                reply._resolve(future.result())
+        # Every reply is read before raising so the stream stays in sync
+        for reply in replies:
+            if reply._error is not None:
+                raise reply._error
+        return [reply._value for reply in replies]
+
+    def __len__(self):
+        return len(self._requests)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.execute()
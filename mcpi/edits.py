@@ -0,0 +1,182 @@
+from .connection import RequestError
+from .minecraft import intFloor
+
+""" Block edits compiled into few world.setBlocks commands.
+
+    A set of single block writes is merged into cuboids of one material with
+    a greedy meshing pass: from the lowest unmerged block, grow along x, then
+    z, then y while every block of the new slice has the same id and data.
+    Walls, floors and filled shapes collapse to a handful of commands.
+
+        with EditBatch(mc) as batch:
+            for x, y, z in positions:
+                batch.setBlock(x, y, z, block.STONE.id)
+
+    With diff=True only the blocks that differ from the world are sent, so
+    rebuilding or resuming a structure that is already there costs a read.
+"""
+
+def compileEdits(edits):
+    """
+    Merges block writes into cuboids => [(x0,y0,z0,x1,y1,z1,id,data)]
+
+    edits are (x,y,z,id) or (x,y,z,id,data) tuples, the last write to a
+    position wins.
+    """
+    blocks = {}
+    for edit in edits:
+        blocks[tuple(edit[:3])] = (edit[3], edit[4] if len(edit) > 4 else 0)
+    return _mesh(blocks)
+
+def _mesh(blocks, free=None):
+    """
+    Greedy meshing of {(x,y,z): (id,data)}, consumes blocks. Cuboids may
+    also cover the blocks of free, which already are what would be written.
+    """
+    free = free or {}
+    def fits(pos, material):
+        return blocks.get(pos, free.get(pos)) == material
+    cuboids = []
+    for start in sorted(blocks, key=lambda pos: (pos[1], pos[2], pos[0])):
+        material = blocks.get(start)
+        if material is None:
+            # already merged into an earlier cuboid
+            continue
+        x0, y0, z0 = start
+        x1 = x0
+        while fits((x1 + 1, y0, z0), material):
+            x1 += 1
+        z1 = z0
+        while all(fits((x, y0, z1 + 1), material) for x in range(x0, x1 + 1)):
+            z1 += 1
+        y1 = y0
+        while all(fits((x, y1 + 1, z), material)
+                  for x in range(x0, x1 + 1) for z in range(z0, z1 + 1)):
+            y1 += 1
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                for z in range(z0, z1 + 1):
+                    blocks.pop((x, y, z), None)
+        cuboids.append((x0, y0, z0, x1, y1, z1) + material)
+    return cuboids
+
+def _same(known, material):
+    """known (id, data or None) is the block material (id, data) would write"""
+    return known[0] == material[0] and (known[1] or 0) == material[1]
+
+class EditBatch:
+    """
+    Collects block writes for a Minecraft object and sends them, merged into
+    cuboids, on flush(). As a context manager it flushes on exit.
+
+    diff=True first drops the writes that would not change the world. The
+    current blocks come from the Minecraft object's blockCache when known
+    with their data value, the rest from one getRegion read of their
+    bounding box, with data values. Servers without world.getBlocksWithData are read with getBlocks,
+    which has no data values: a block read that way matches when the id is
+    the same and the data written is 0.
+    """
+    # setBlocks larger than this are sent as they are, not split into blocks
+    MaxCuboidMerge = 4096
+    # diff reads larger than this are skipped, the writes are all sent
+    MaxDiffRead = 65536
+
+    def __init__(self, mc, diff=False):
+        self.mc = mc
+        self.diff = diff
+        self.blocks = {}
+        # writes dropped by the diff, over the life of the batch
+        self.unchanged = 0
+        self._readData = True
+
+    def setBlock(self, *args):
+        """Queues a block (x,y,z,id,[data])"""
+        x, y, z, id, *data = intFloor(args)
+        self.blocks[(x, y, z)] = (id, data[0] if data else 0)
+
+    def setBlocks(self, *args):
+        """Queues a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data])"""
+        x0, y0, z0, x1, y1, z1, id, *data = intFloor(args)
+        material = (id, data[0] if data else 0)
+        xs = range(min(x0, x1), max(x0, x1) + 1)
+        ys = range(min(y0, y1), max(y0, y1) + 1)
+        zs = range(min(z0, z1), max(z0, z1) + 1)
+        if len(xs) * len(ys) * len(zs) > EditBatch.MaxCuboidMerge:
+            # keep the order of the writes: what is queued goes first
+            self.flush()
+            self.mc.setBlocks(x0, y0, z0, x1, y1, z1, *material)
+            return
+        for x in xs:
+            for y in ys:
+                for z in zs:
+                    self.blocks[(x, y, z)] = material
+
+    def compile(self):
+        """The queued writes as cuboids, without sending them => [(x0,y0,z0,x1,y1,z1,id,data)]"""
+        return _mesh(dict(self.blocks))
+
+    def _dropUnchanged(self):
+        """Removes the queued writes that match the world => {pos: material} removed"""
+        blocks = self.blocks
+        cache = getattr(self.mc, "blockCache", None)
+        unchanged = {}
+        unknown = []
+        for pos, material in blocks.items():
+            # an entry read without its data value can't tell red wool from white
+            known = cache.get(*pos, withData=True) if cache is not None else None
+            if known is None:
+                unknown.append(pos)
+            elif _same(known, material):
+                unchanged[pos] = material
+        if unknown:
+            x0, x1 = min(p[0] for p in unknown), max(p[0] for p in unknown)
+            y0, y1 = min(p[1] for p in unknown), max(p[1] for p in unknown)
+            z0, z1 = min(p[2] for p in unknown), max(p[2] for p in unknown)
+            if (x1 - x0 + 1) * (y1 - y0 + 1) * (z1 - z0 + 1) <= EditBatch.MaxDiffRead:
+                region = self._read(x0, y0, z0, x1, y1, z1)
+                for pos in unknown:
+                    if region.data is not None:
+                        known = tuple(region.getBlockWithData(*pos))
+                    else:
+                        known = (region.getBlock(*pos), None)
+                    if _same(known, blocks[pos]):
+                        unchanged[pos] = blocks[pos]
+        for pos in unchanged:
+            del blocks[pos]
+        self.unchanged += len(unchanged)
+        return unchanged
+
+    def _read(self, *corners):
+        if self._readData:
+            try:
+                return self.mc.getRegion(*corners, withData=True)
+            except RequestError:
+                # the server has no world.getBlocksWithData
+                self._readData = False
+        return self.mc.getRegion(*corners)
+
+    def flush(self):
+        """Sends the queued writes => int (commands sent)"""
+        unchanged = None
+        if self.diff and self.blocks:
+            # unchanged blocks are not sent, but cuboids may still cover them
+            unchanged = self._dropUnchanged()
+        cuboids = _mesh(self.blocks, unchanged)
+        if cuboids:
+            with self.mc.pipeline() as pipe:
+                for x0, y0, z0, x1, y1, z1, id, data in cuboids:
+                    if (x0, y0, z0) == (x1, y1, z1):
+                        pipe.setBlock(x0, y0, z0, id, data)
+                    else:
+                        pipe.setBlocks(x0, y0, z0, x1, y1, z1, id, data)
+        return len(cuboids)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
@@ -0,0 +1,115 @@
+import asyncio
+
+class EventStream:
+    """
+    Polls the server for events in a background task and fans them out to
+    any number of subscribers, each an async iterator.
+
+        async for post in mc.events.stream().subscribe(ChatEvent):
+            ...
+
+    poll is a coroutine function returning a list of events, called with
+    the event classes the subscribers want (None for all), so events
+    nobody subscribed to are left on the server. The polling
+    interval starts at minInterval, grows by Backoff on every poll that
+    returns nothing, up to maxInterval, and drops back to minInterval as
+    soon as something arrives. Polling only runs while there are
+    subscribers.
+    """
+    Backoff = 1.5
+
+    def __init__(self, poll, minInterval=0.05, maxInterval=0.5):
+        self.poll = poll
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.interval = minInterval
+        self.polls = 0
+        self._subscribers = []
+        self._task = None
+
+    def subscribe(self, *types):
+        """Subscribes to the events of the given classes, all if none => Subscription"""
+        subscription = Subscription(self, types)
+        self._subscribers.append(subscription)
+        if self._task is None or self._task.done():
+            self.interval = self.minInterval
+            self._task = asyncio.get_running_loop().create_task(self._pollLoop())
+        return subscription
+
+    def types(self):
+        """The event classes the subscribers want, None if one wants them all"""
+        types = set()
+        for subscription in self._subscribers:
+            if not subscription.types:
+                return None
+            types.update(subscription.types)
+        return tuple(types)
+
+    def _unsubscribe(self, subscription):
+        if subscription in self._subscribers:
+            self._subscribers.remove(subscription)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _pollLoop(self):
+        while self._subscribers:
+            try:
+                events = await self.poll(self.types())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                for subscription in self._subscribers:
+                    subscription._queue.put_nowait(e)
+                return
+            self.polls += 1
+            for event in events:
+                for subscription in self._subscribers:
+                    subscription._offer(event)
+            if events:
+                self.interval = self.minInterval
+            else:
+                self.interval = min(self.interval * EventStream.Backoff, self.maxInterval)
+            await asyncio.sleep(self.interval)
+
+    def close(self):
+        """Ends every subscription and stops polling"""
+        for subscription in list(self._subscribers):
+            subscription.close()
+
+class Subscription:
+    """The events of an EventStream for one consumer, in the order they arrived"""
+    def __init__(self, stream, types):
+        self.stream = stream
+        self.types = types
+        self._queue = asyncio.Queue()
+        self._closed = False
+
+    def _offer(self, event):
+        if not self.types or isinstance(event, self.types):
+            self._queue.put_nowait(event)
+
+    def close(self):
+        """Stops receiving events, iteration ends once the queued ones are read"""
+        if not self._closed:
+            self._closed = True
+            self.stream._unsubscribe(self)
+            self._queue.put_nowait(StopAsyncIteration())
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self._queue.get()
+        if isinstance(item, BaseException):
+            # a failed poll ends every subscription with its error
+            if not isinstance(item, StopAsyncIteration):
+                self.close()
+            raise item
+        return item
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,308 @@
+import argparse
+import collections
+import math
+import socket
+import socketserver
+import threading
+import time
+from . import block
+
+""" A local stand-in for a RaspberryJuice server, for benchmarks and offline runs.
+
+    Speaks the same line protocol as mcpi.connection over TCP and keeps the
+    world in memory. Terrain comes from a height function and every request
+    can be delayed by a configurable latency, applied to the replies like a
+    network round trip (pipelined requests overlap their waits).
+
+        server = LocalServer(port=0, latency=0.002).start()
+        mc = Minecraft.create("localhost", server.port)
+
+    Or from a shell: python -m mcpi.localserver --port 4711 --latency 0.002
+"""
+
+def flatTerrain(height):
+    """Height function of a flat world at y=height"""
+    return lambda x, z: height
+
+def hillyTerrain(base=64, amplitude=6, wavelength=40.0):
+    """Height function of smooth deterministic hills"""
+    k = 2 * math.pi / wavelength
+    return lambda x, z: int(base + amplitude * math.sin(x * k) * math.cos(z * k))
+
+class World:
+    """
+    In-memory voxel world: terrain from a height function plus the blocks
+    set through the API. Thread safe.
+
+    Terrain columns are bedrock at y=0, stone up to 4 below the surface, dirt
+    and a grass block at the surface height.
+    """
+    def __init__(self, heightFn=None):
+        self.heightFn = heightFn or flatTerrain(64)
+        self.edits = {}
+        self.columns = {}
+        self.chat = []
+        self.blockHits = []
+        self.posted = []
+        self.player = [0.5, 65.0, 0.5]
+        self._checkpoint = None
+        self.lock = threading.RLock()
+
+    def terrainBlock(self, x, y, z):
+        h = self.heightFn(x, z)
+        if y > h or y < 0:
+            return (block.AIR.id, 0)
+        if y == 0:
+            return (block.BEDROCK.id, 0)
+        if y == h:
+            return (block.GRASS.id, 0)
+        if y > h - 4:
+            return (block.DIRT.id, 0)
+        return (block.STONE.id, 0)
+
+    def getBlock(self, x, y, z):
+        """=> (id, data)"""
+        edit = self.edits.get((x, y, z))
+        return edit if edit is not None else self.terrainBlock(x, y, z)
+
+    def setBlock(self, x, y, z, id, data=0):
+        with self.lock:
+            self.edits[(x, y, z)] = (id, data)
+            if y > self.columns.get((x, z), -1):
+                self.columns[(x, z)] = y
+
+    def setBlocks(self, x0, y0, z0, x1, y1, z1, id, data=0):
+        with self.lock:
+            for x in range(min(x0, x1), max(x0, x1) + 1):
+                for y in range(min(y0, y1), max(y0, y1) + 1):
+                    for z in range(min(z0, z1), max(z0, z1) + 1):
+                        self.setBlock(x, y, z, id, data)
+
+    def getHeight(self, x, z):
+        """y of the highest non-air block of the column"""
+        with self.lock:
+            y = self.heightFn(x, z)
+            y = max(y, self.columns.get((x, z), -1))
+            while y > 0 and self.getBlock(x, y, z)[0] == block.AIR.id:
+                y -= 1
+            return y
+
+    def cuboid(self, x0, y0, z0, x1, y1, z1):
+        """Blocks of a cuboid in RaspberryJuice order (y, then x, then z) => [(id, data)]"""
+        with self.lock:
+            return [self.getBlock(x, y, z)
+                    for y in range(min(y0, y1), max(y0, y1) + 1)
+                    for x in range(min(x0, x1), max(x0, x1) + 1)
+                    for z in range(min(z0, z1), max(z0, z1) + 1)]
+
+    def postChat(self, entityId, message):
+        """Simulates a player typing in the chat"""
+        with self.lock:
+            self.chat.append((entityId, message))
+
+    def hitBlock(self, x, y, z, face=0, entityId=1):
+        """Simulates a player hitting a block with a sword"""
+        with self.lock:
+            self.blockHits.append((x, y, z, face, entityId))
+
+    def saveCheckpoint(self):
+        with self.lock:
+            self._checkpoint = dict(self.edits), dict(self.columns)
+
+    def restoreCheckpoint(self):
+        with self.lock:
+            if self._checkpoint is not None:
+                edits, columns = self._checkpoint
+                self.edits, self.columns = dict(edits), dict(columns)
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One client connection: reads request lines, writes reply lines"""
+
+    def setup(self):
+        socketserver.StreamRequestHandler.setup(self)
+        # replies are written one by one, Nagle would hold them back
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.world = self.server.world
+        self.latency = self.server.latency
+        self.due = collections.deque()
+        self.dueCond = threading.Condition()
+        self.open = True
+        if self.latency:
+            threading.Thread(target=self._delayedWriter, daemon=True).start()
+
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode("cp437").rstrip("\r\n")
+            if not line:
+                continue
+            with self.server.world.lock:
+                self.server.requests += 1
+            try:
+                reply = self.execute(line)
+            except Exception:
+                reply = "Fail"
+            if reply is not None:
+                self.reply(reply.encode("cp437") + b"\n")
+
+    def finish(self):
+        with self.dueCond:
+            self.open = False
+            self.dueCond.notify()
+        socketserver.StreamRequestHandler.finish(self)
+
+    def reply(self, data):
+        if not self.latency:
+            self.wfile.write(data)
+            return
+        with self.dueCond:
+            self.due.append((time.monotonic() + self.latency, data))
+            self.dueCond.notify()
+
+    def _delayedWriter(self):
+        """Writes every reply once its latency has elapsed, keeping the order"""
+        while True:
+            with self.dueCond:
+                while self.open and not self.due:
+                    self.dueCond.wait()
+                if not self.due:
+                    return
+                dueAt, data = self.due[0]
+                wait = dueAt - time.monotonic()
+                if wait > 0:
+                    self.dueCond.wait(wait)
+                    continue
+                self.due.popleft()
+            try:
+                self.wfile.write(data)
+            except OSError:
+                return
+
+    def execute(self, line):
+        """Runs one request => reply line or None for commands without a reply"""
+        command, _, args = line.partition("(")
+        args = args[:-1] if args.endswith(")") else args
+        world = self.world
+
+        if command == "world.getBlock":
+            return str(world.getBlock(*_ints(args))[0])
+        if command == "world.getBlockWithData":
+            return "%d,%d" % world.getBlock(*_ints(args))
+        if command == "world.getBlocks":
+            return ",".join(str(id) for id, _ in world.cuboid(*_ints(args)))
+        if command == "world.getBlocksWithData":
+            return "|".join("%d,%d" % b for b in world.cuboid(*_ints(args)))
+        if command == "world.getHeight":
+            return str(world.getHeight(*_ints(args)))
+        if command == "world.setBlock":
+            world.setBlock(*_ints(args))
+            return None
+        if command == "world.setBlocks":
+            world.setBlocks(*_ints(args))
+            return None
+        if command == "world.getPlayerIds":
+            return "1"
+        if command == "world.getPlayerId":
+            return "1"
+        if command == "world.setting":
+            return None
+        if command == "world.checkpoint.save":
+            world.saveCheckpoint()
+            return None
+        if command == "world.checkpoint.restore":
+            world.restoreCheckpoint()
+            return None
+        if command == "chat.post":
+            with world.lock:
+                world.posted.append(args)
+            return None
+        if command == "events.chat.posts":
+            with world.lock:
+                posts, world.chat = world.chat, []
+            return "|".join("%d,%s" % post for post in posts)
+        if command == "events.block.hits":
+            with world.lock:
+                hits, world.blockHits = world.blockHits, []
+            return "|".join("%d,%d,%d,%d,%d" % hit for hit in hits)
+        if command == "events.clear":
+            with world.lock:
+                world.chat, world.blockHits = [], []
+            return None
+
+        package, _, method = command.partition(".")
+        if package in ("player", "entity"):
+            values = args.split(",") if args else []
+            if package == "entity":
+                values = values[1:]
+            if method == "getPos":
+                return "%s,%s,%s" % tuple(world.player)
+            if method == "getTile":
+                return "%d,%d,%d" % tuple(int(math.floor(v)) for v in world.player)
+            if method in ("setPos", "setTile"):
+                world.player = [float(v) for v in values[:3]]
+                return None
+            if method == "getDirection":
+                return "1.0,0.0,0.0"
+            if method in ("getRotation", "getPitch"):
+                return "0.0"
+            if method == "setting":
+                return None
+        if package == "camera":
+            # there is no camera to move here
+            return None
+        return "Fail"
+
+def _ints(args):
+    return [int(math.floor(float(a))) for a in args.split(",")]
+
+class LocalServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    Threaded TCP server answering the mcpi protocol from a World.
+
+    :param float latency: seconds added to every reply, like a network round trip.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address="localhost", port=4711, world=None, latency=0.0):
+        socketserver.TCPServer.__init__(self, (address, port), _Handler)
+        self.world = world or World()
+        self.latency = latency
+        self.requests = 0
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve from a background thread => self"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mcpi (RaspberryJuice) stand-in server")
+    parser.add_argument("--address", default="localhost")
+    parser.add_argument("--port", type=int, default=4711)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every reply")
+    parser.add_argument("--height", type=int, default=64, help="surface height of the flat world")
+    parser.add_argument("--hills", action="store_true", help="hilly terrain instead of flat")
+    args = parser.parse_args()
+
+    terrain = hillyTerrain(args.height) if args.hills else flatTerrain(args.height)
+    server = LocalServer(args.address, args.port, World(terrain), args.latency)
+    print("Serving mcpi on %s:%d" % (args.address, server.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
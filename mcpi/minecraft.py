@@ -1,9 +1,13 @@
-from .connection import Connection
+from .connection import Connection, Reply
 from .vec3 import Vec3
 from .event import BlockEvent, ChatEvent
+from .eventstream import EventStream
 from .block import Block
+from .region import Region, Heightmap, parseIds
+import asyncio
 import math
-from .util import flatten
+from array import array
+from .util import flatten, flat_ints
 
 """ Minecraft PI low level api v0.1_1
 
@@ -26,6 +30,9 @@ from .util import flatten
 - pollChatPosts() """
 
 def intFloor(*args):
+    ints = flat_ints(args)
+    if ints is not None:
+        return list(ints)
     return [int(math.floor(x)) for x in flatten(args)]
 
 class CmdPositioner:
@@ -122,6 +129,7 @@ class CmdEvents:
     """Events"""
     def __init__(self, connection):
         self.conn = connection
+        self._stream = None
 
     def clearAll(self):
         """Clear all old events"""
@@ -130,19 +138,150 @@ class CmdEvents:
     def pollBlockHits(self):
         """Only triggered by sword => [BlockEvent]"""
         s = self.conn.sendReceive(b"events.block.hits")
-        events = [e for e in s.split("|") if e]
-        return [BlockEvent.Hit(*list(map(int, e.split(",")))) for e in events]
+        return _parseBlockHits(s)
 
     def pollChatPosts(self):
         """Triggered by posts to chat => [ChatEvent]"""
         s = self.conn.sendReceive(b"events.chat.posts")
-        events = [e for e in s.split("|") if e]
-        return [ChatEvent.Post(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in events]
+        return _parseChatPosts(s)
+
+    def pollAll(self, types=None):
+        """Chat posts and block hits, in one round trip => [ChatEvent|BlockEvent]
+
+        types, e.g. (ChatEvent,), polls only those: every poll empties the
+        server's queue for everybody else reading it"""
+        replies = []
+        with self.conn.pipeline() as pipe:
+            if _wants(types, ChatEvent):
+                replies.append(pipe.sendReceive(b"events.chat.posts", parse=_parseChatPosts))
+            if _wants(types, BlockEvent):
+                replies.append(pipe.sendReceive(b"events.block.hits", parse=_parseBlockHits))
+        return [event for reply in replies for event in reply.result()]
+
+    def stream(self):
+        """The EventStream of chat posts and block hits, polled from a
+        worker thread so the event loop is never blocked => EventStream"""
+        if self._stream is None:
+            self._stream = EventStream(lambda types: asyncio.to_thread(self.pollAll, types))
+        return self._stream
+
+def _wants(types, eventClass):
+    """types (None for all) has eventClass or a base class of it"""
+    return types is None or any(issubclass(eventClass, t) for t in types)
+
+def _parseBlockHits(s):
+    events = [e for e in s.split("|") if e]
+    return [BlockEvent.Hit(*list(map(int, e.split(",")))) for e in events]
+
+def _parseChatPosts(s):
+    events = [e for e in s.split("|") if e]
+    return [ChatEvent.Post(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in events]
+
+class CmdPipeline:
+    """Pipelined world queries. Each call returns a Reply, all of them are
+    sent in one write and resolved in order by execute()"""
+    def __init__(self, connection, blockCache=None, heightCache=None):
+        self.pipe = connection.pipeline()
+        self.blockCache = blockCache
+        self.heightCache = heightCache
+
+    def getBlock(self, *args):
+        """Get block (x,y,z) => Reply(id:int)"""
+        pos = intFloor(args)
+        cache = self.blockCache
+        if cache is None:
+            return self.pipe.sendReceive(b"world.getBlock", pos, parse=int)
+        known = cache.get(*pos)
+        if known is not None:
+            return Reply.of(known[0])
+        since = cache.mark()
+        def parse(s):
+            id = int(s)
+            cache.put(*pos, id, since=since)
+            return id
+        return self.pipe.sendReceive(b"world.getBlock", pos, parse=parse)
+
+    def getBlockWithData(self, *args):
+        """Get block with data (x,y,z) => Reply(Block)"""
+        pos = intFloor(args)
+        cache = self.blockCache
+        if cache is None:
+            return self.pipe.sendReceive(b"world.getBlockWithData", pos, parse=_parseBlock)
+        known = cache.get(*pos, withData=True)
+        if known is not None:
+            return Reply.of(Block(*known))
+        since = cache.mark()
+        def parse(s):
+            b = _parseBlock(s)
+            cache.put(*pos, b.id, b.data, since=since)
+            return b
+        return self.pipe.sendReceive(b"world.getBlockWithData", pos, parse=parse)
+
+    def getHeight(self, *args):
+        """Get the height of the world (x,z) => Reply(int)"""
+        column = intFloor(args)
+        cache = self.heightCache
+        if cache is None:
+            return self.pipe.sendReceive(b"world.getHeight", column, parse=int)
+        known = cache.get(*column)
+        if known is not None:
+            return Reply.of(known)
+        def parse(s):
+            h = int(s)
+            cache.put(*column, h)
+            return h
+        return self.pipe.sendReceive(b"world.getHeight", column, parse=parse)
+
+    def setBlock(self, *args):
+        """Set block (x,y,z,id,[data])"""
+        args = intFloor(args)
+        self.pipe.send(b"world.setBlock", args)
+        _cacheSetBlock(self.blockCache, self.heightCache, args)
+
+    def setBlocks(self, *args):
+        """Set a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data])"""
+        args = intFloor(args)
+        self.pipe.send(b"world.setBlocks", args)
+        _cacheSetBlocks(self.blockCache, self.heightCache, args)
+
+    def execute(self):
+        """Send the queued commands and read the replies => [result]"""
+        return self.pipe.execute()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.execute()
+
+def _parseBlock(s):
+    id, _, data = s.partition(",")
+    return Block(int(id), int(data) if data else 0)
+
+def _cacheSetBlock(cache, heightCache, args):
+    if cache is not None and len(args) >= 4:
+        cache.put(*args[:4], args[4] if len(args) > 4 else 0)
+    if heightCache is not None and len(args) >= 3:
+        heightCache.invalidate(args[0], args[2])
+
+def _cacheSetBlocks(cache, heightCache, args):
+    if cache is not None and len(args) >= 7:
+        cache.putCuboid(*args[:7], args[7] if len(args) > 7 else 0)
+    if heightCache is not None and len(args) >= 6:
+        heightCache.invalidateArea(args[0], args[2], args[3], args[5])
 
 class Minecraft:
-    """The main class to interact with a running instance of Minecraft Pi."""
-    def __init__(self, connection):
+    """The main class to interact with a running instance of Minecraft Pi.
+
+    An optional mcpi.cache.BlockCache serves getBlock/getBlockWithData from
+    memory when the block is known and is kept up to date by setBlock/s,
+    also those of other Minecraft objects sharing it.
+    An optional mcpi.cache.HeightCache does the same for getHeight/s."""
+    def __init__(self, connection, blockCache=None, heightCache=None):
         self.conn = connection
+        self.blockCache = blockCache
+        self.heightCache = heightCache
 
         self.camera = CmdCamera(connection)
         self.entity = CmdEntity(connection)
@@ -151,29 +290,88 @@ class Minecraft:
 
     def getBlock(self, *args):
         """Get block (x,y,z) => id:int"""
-        return int(self.conn.sendReceive(b"world.getBlock", intFloor(args)))
+        pos = intFloor(args)
+        if self.blockCache is None:
+            return int(self.conn.sendReceive(b"world.getBlock", pos))
+        known = self.blockCache.get(*pos)
+        if known is not None:
+            return known[0]
+        # a write by another user of the cache while this read is on its way wins
+        since = self.blockCache.mark()
+        id = int(self.conn.sendReceive(b"world.getBlock", pos))
+        self.blockCache.put(*pos, id, since=since)
+        return id
 
     def getBlockWithData(self, *args):
         """Get block with data (x,y,z) => Block"""
-        ans = self.conn.sendReceive(b"world.getBlockWithData", intFloor(args))
-        return Block(*list(map(int, ans.split(","))))
+        pos = intFloor(args)
+        since = None
+        if self.blockCache is not None:
+            known = self.blockCache.get(*pos, withData=True)
+            if known is not None:
+                return Block(*known)
+            since = self.blockCache.mark()
+        ans = self.conn.sendReceive(b"world.getBlockWithData", pos)
+        b = _parseBlock(ans)
+        if self.blockCache is not None:
+            self.blockCache.put(*pos, b.id, b.data, since=since)
+        return b
 
     def getBlocks(self, *args):
-        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) => [id:int]"""
-        s = self.conn.sendReceive(b"world.getBlocks", intFloor(args))
-        return map(int, s.split(","))
+        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) => array('H') of ids"""
+        return parseIds(self.conn.sendReceive(b"world.getBlocks", intFloor(args), raw=True))
+
+    def getRegion(self, *args, withData=False):
+        """Get a cuboid of blocks in one round trip (x0,y0,z0,x1,y1,z1) => Region
+
+        withData=True also reads the data values (world.getBlocksWithData)"""
+        corners = intFloor(args)
+        since = self.blockCache.mark() if self.blockCache is not None else None
+        if withData:
+            s = self.conn.sendReceive(b"world.getBlocksWithData", corners, raw=True)
+            region = Region.parseWithData(*corners, s)
+        else:
+            region = Region.parse(*corners, self.conn.sendReceive(b"world.getBlocks", corners, raw=True))
+        if self.blockCache is not None:
+            self.blockCache.putRegion(region, since=since)
+        return region
 
     def setBlock(self, *args):
         """Set block (x,y,z,id,[data])"""
-        self.conn.send(b"world.setBlock", intFloor(args))
+        args = intFloor(args)
+        self.conn.send(b"world.setBlock", args)
+        _cacheSetBlock(self.blockCache, self.heightCache, args)
 
     def setBlocks(self, *args):
         """Set a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data])"""
-        self.conn.send(b"world.setBlocks", intFloor(args))
+        args = intFloor(args)
+        self.conn.send(b"world.setBlocks", args)
+        _cacheSetBlocks(self.blockCache, self.heightCache, args)
 
     def getHeight(self, *args):
         """Get the height of the world (x,z) => int"""
-        return int(self.conn.sendReceive(b"world.getHeight", intFloor(args)))
+        column = intFloor(args)
+        if self.heightCache is None:
+            return int(self.conn.sendReceive(b"world.getHeight", column))
+        h = self.heightCache.get(*column)
+        if h is None:
+            h = int(self.conn.sendReceive(b"world.getHeight", column))
+            self.heightCache.put(*column, h)
+        return h
+
+    def getHeights(self, *args):
+        """Get the heights of a rectangle of columns (x0,z0,x1,z1) => Heightmap
+
+        Unknown columns are queried in one pipelined batch."""
+        x0, z0, x1, z1 = intFloor(args)
+        x0, x1 = min(x0, x1), max(x0, x1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        pipe = CmdPipeline(self.conn, heightCache=self.heightCache)
+        replies = [pipe.getHeight(x, z)
+                   for x in range(x0, x1 + 1)
+                   for z in range(z0, z1 + 1)]
+        pipe.execute()
+        return Heightmap(x0, z0, x1, z1, array("h", [reply.result() for reply in replies]))
 
     def getPlayerEntityIds(self):
         """Get the entity ids of the connected players => [id:int]"""
@@ -191,6 +389,10 @@ class Minecraft:
     def restoreCheckpoint(self):
         """Restore the world state to the checkpoint"""
         self.conn.send(b"world.checkpoint.restore")
+        if self.blockCache is not None:
+            self.blockCache.clear()
+        if self.heightCache is not None:
+            self.heightCache.clear()
 
     def postToChat(self, msg):
         """Post a message to the game chat"""
@@ -200,6 +402,14 @@ class Minecraft:
         """Set a world setting (setting, status). keys: world_immutable, nametags_visible"""
         self.conn.send(b"world.setting", setting, 1 if bool(status) else 0)
 
+    def flush(self):
+        """Send the buffered fire-and-forget commands (setBlock, postToChat...) now"""
+        self.conn.flush()
+
+    def pipeline(self):
+        """Batch many queries into a single round trip => CmdPipeline"""
+        return CmdPipeline(self.conn, self.blockCache, self.heightCache)
+
     @staticmethod
     def create(address = "localhost", port = 4711):
         return Minecraft(Connection(address, port))
@@ -6,13 +6,26 @@ try:
     import mcpi.minecraft as minecraft
     import mcpi.block as block
     import mcpi.util as util
+    import mcpi.voxels as voxels
+    from mcpi.edits import EditBatch
+    from mcpi.vec3 import Vec3Array
 except ImportError:
     import minecraft
     import block
     import util
+    import voxels
+    from edits import EditBatch
+    from vec3 import Vec3Array
 
 import time
 import math
+import functools
+from contextlib import contextmanager
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class Points():
     """
@@ -42,6 +55,17 @@ class Points():
         """
         return self._points
     
+def _batchedDraw(draw):
+    """
+    decorator for the ``MinecraftDrawing`` functions, which then send their
+    points merged into ``setBlocks`` cuboids rather than block by block.
+    """
+    @functools.wraps(draw)
+    def batchedDraw(self, *args, **kwargs):
+        with self._batched():
+            return draw(self, *args, **kwargs)
+    return batchedDraw
+
 class MinecraftDrawing:
     """
     MinecraftDrawing - a class of useful drawing functions
@@ -51,6 +75,23 @@ class MinecraftDrawing:
     """
     def __init__(self, mc):
         self.mc = mc
+        self._batch = None
+
+    @contextmanager
+    def _batched(self):
+        """
+        collects the points drawn inside it in an ``EditBatch``, sent merged
+        into cuboids on exit. Nested calls share the outer batch.
+        """
+        if self._batch is not None:
+            yield self._batch
+            return
+        self._batch = EditBatch(self.mc)
+        try:
+            yield self._batch
+            self._batch.flush()
+        finally:
+            self._batch = None
 
     def drawPoint3d(self, x, y, z, blockType, blockData=0):
         """
@@ -72,9 +113,13 @@ class MinecraftDrawing:
             The block data value, defaults to ``0``.
         """
         
-        self.mc.setBlock(x,y,z,blockType,blockData)
+        if self._batch is not None:
+            self._batch.setBlock(x,y,z,blockType,blockData)
+        else:
+            self.mc.setBlock(x,y,z,blockType,blockData)
         #print "x = " + str(x) + ", y = " + str(y) + ", z = " + str(z)
 
+    @_batchedDraw
     def drawFace(self, vertices, filled, blockType, blockData=0):
         """
         draws a face, when passed a collection of vertices which make up a polyhedron
@@ -116,24 +161,12 @@ class MinecraftDrawing:
 
         if (filled):
             #draw solid face
-            # this algorithm isnt very efficient, but it does always fill the gap
-            
-            # sort the edges vertices
-            def keyX( point ): return point.x
-            def keyY( point ): return point.y
-            def keyZ( point ): return point.z
-            edgesVertices.sort( key=keyZ )
-            edgesVertices.sort( key=keyY )
-            edgesVertices.sort( key=keyX )
-
-            #draw lines between the points on the edges
-            lastVertex = edgesVertices[0]
-            for vertex in edgesVertices[1:]:
-                # got 2 vertices, draw lines between them
-                self.drawLine(lastVertex.x, lastVertex.y, lastVertex.z, vertex.x, vertex.y, vertex.z, blockType, blockData)
-                #print "x = " + str(lastVertex.x) + ", y = " + str(lastVertex.y) + ", z = " + str(lastVertex.z) + " x2 = " + str(vertex.x) + ", y2 = " + str(vertex.y) + ", z2 = " + str(vertex.z)
-                # persist the last vertex found
-                lastVertex = vertex
+            # the edges plus the inside, rasterized row by row on the plane of
+            # the face: every block is drawn once and the batch merges the rows
+            points = set((vertex.x, vertex.y, vertex.z) for vertex in edgesVertices)
+            points.update(voxels.polygonCells([(vertex.x, vertex.y, vertex.z) for vertex in vertices]))
+            for x, y, z in points:
+                self.drawPoint3d(x, y, z, blockType, blockData)
 
         else:
             #draw wireframe
@@ -153,8 +186,9 @@ class MinecraftDrawing:
             The block data value, defaults to ``0``.
         """
 
-        for vertex in vertices:
-            self.drawPoint3d(vertex.x, vertex.y, vertex.z, blockType, blockData)
+        # consecutive points in a straight row are drawn as one setBlocks
+        self._drawCuboids(0, 0, 0, voxels.pointRuns((vertex.x, vertex.y, vertex.z) for vertex in vertices),
+                          blockType, blockData)
 
     def drawLine(self, x1, y1, z1, x2, y2, z2, blockType, blockData=0):
         """
@@ -184,7 +218,8 @@ class MinecraftDrawing:
         :param int blockData:
             The block data value, defaults to ``0``.
         """
-        self.drawVertices(self.getLine(x1, y1, z1, x2, y2, z2), blockType, blockData)
+        self._drawCuboids(0, 0, 0, voxels.pointRuns(self.iterLine(x1, y1, z1, x2, y2, z2)),
+                          blockType, blockData)
 
     
     def drawSphere(self, x1, y1, z1, radius, blockType, blockData=0):
@@ -209,11 +244,7 @@ class MinecraftDrawing:
         :param int blockData:
             The block data value, defaults to ``0``.
         """
-        for x in range(radius * -1, radius):
-            for y in range(radius * -1, radius):
-                for z in range(radius * -1, radius):
-                    if x**2 + y**2 + z**2 < radius**2:
-                        self.drawPoint3d(x1 + x, y1 + y, z1 + z, blockType, blockData)
+        self._drawCuboids(x1, y1, z1, voxels.sphereCuboids(radius), blockType, blockData)
 
     def drawHollowSphere(self, x1, y1, z1, radius, blockType, blockData=0):
         """
@@ -237,11 +268,22 @@ class MinecraftDrawing:
         :param int blockData:
             The block data value, defaults to ``0``.
         """
-        for x in range(radius * -1, radius):
-            for y in range(radius * -1, radius):
-                for z in range(radius * -1, radius):
-                    if (x**2 + y**2 + z**2 < radius**2) and (x**2 + y**2 + z**2 > (radius**2 - (radius * 2))):
-                        self.drawPoint3d(x1 + x, y1 + y, z1 +z, blockType, blockData)
+        self._drawCuboids(x1, y1, z1, voxels.sphereCuboids(radius, hollow=True), blockType, blockData)
+
+    def _drawCuboids(self, x, y, z, cuboids, blockType, blockData=0):
+        """
+        draws cuboids relative to x,y,z, as one ``setBlocks`` each (``setBlock``
+        for single blocks), all in a single write (or into the batch of an
+        enclosing drawing)
+        """
+        target = self._batch if self._batch is not None else self.mc.pipeline()
+        for x0, y0, z0, x1, y1, z1 in cuboids:
+            if x0 == x1 and y0 == y1 and z0 == z1:
+                target.setBlock(x + x0, y + y0, z + z0, blockType, blockData)
+            else:
+                target.setBlocks(x + x0, y + y0, z + z0, x + x1, y + y1, z + z1, blockType, blockData)
+        if self._batch is None:
+            target.execute()
 
     def drawCircle(self, x0, y0, z, radius, blockType, blockData=0):
         """
@@ -265,35 +307,10 @@ class MinecraftDrawing:
         :param int blockData:
             The block data value, defaults to ``0``.
         """
-        
-        f = 1 - radius
-        ddf_x = 1
-        ddf_y = -2 * radius
-        x = 0
-        y = radius
-        self.drawPoint3d(x0, y0 + radius, z, blockType, blockData)
-        self.drawPoint3d(x0, y0 - radius, z, blockType, blockData)
-        self.drawPoint3d(x0 + radius, y0, z, blockType, blockData)
-        self.drawPoint3d(x0 - radius, y0, z, blockType, blockData)
-     
-        while x < y:
-            if f >= 0:
-                y -= 1
-                ddf_y += 2
-                f += ddf_y
-            x += 1
-            ddf_x += 2
-            f += ddf_x   
-            self.drawPoint3d(x0 + x, y0 + y, z, blockType, blockData)
-            self.drawPoint3d(x0 - x, y0 + y, z, blockType, blockData)
-            self.drawPoint3d(x0 + x, y0 - y, z, blockType, blockData)
-            self.drawPoint3d(x0 - x, y0 - y, z, blockType, blockData)
-            self.drawPoint3d(x0 + y, y0 + x, z, blockType, blockData)
-            self.drawPoint3d(x0 - y, y0 + x, z, blockType, blockData)
-            self.drawPoint3d(x0 + y, y0 - x, z, blockType, blockData)
-            self.drawPoint3d(x0 - y, y0 - x, z, blockType, blockData)
+        # midpoint circle, as straight runs of blocks
+        self._drawCuboids(x0, y0, z, [(a0, b0, 0, a1, b1, 0) for a0, b0, a1, b1 in voxels.circleSegments(radius)],
+                          blockType, blockData)
 
-    
     def drawHorizontalCircle(self, x0, y, z0, radius, blockType, blockData=0):
         """
         draws a circle in the X plane (i.e. horizontally)
@@ -316,38 +333,105 @@ class MinecraftDrawing:
         :param int blockData:
             The block data value, defaults to ``0``.
         """
+        # midpoint circle, as straight runs of blocks
+        self._drawCuboids(x0, y, z0, [(a0, 0, b0, a1, 0, b1) for a0, b0, a1, b1 in voxels.circleSegments(radius)],
+                          blockType, blockData)
+
+    def drawHorizontalDisc(self, x0, y, z0, radius, blockType, blockData=0):
+        """
+        draws a filled circle in the X plane (i.e. horizontally), bounded by
+        the blocks of ``drawHorizontalCircle``
+
+        :param int x0:
+            The x position of the centre of the disc.
+
+        :param int y:
+            The y position of the centre of the disc.
+
+        :param int z0:
+            The z position of the centre of the disc.
+
+        :param int radius:
+            The radius of the disc.
+
+        :param int blockType:
+            The block id.
+
+        :param int blockData:
+            The block data value, defaults to ``0``.
+        """
+        self.drawCylinder(x0, y, z0, radius, 1, blockType, blockData)
+
+    def drawCylinder(self, x0, y, z0, radius, height, blockType, blockData=0, filled=True):
+        """
+        draws a vertical cylinder standing on a horizontal circle, e.g. a
+        column or a tower
+
+        :param int x0:
+            The x position of the centre of the base.
+
+        :param int y:
+            The y position of the base.
+
+        :param int z0:
+            The z position of the centre of the base.
+
+        :param int radius:
+            The radius of the cylinder.
+
+        :param int height:
+            The number of blocks high.
+
+        :param int blockType:
+            The block id.
+
+        :param int blockData:
+            The block data value, defaults to ``0``.
+
+        :param boolean filled:
+            If ``False`` only the wall is drawn, defaults to ``True``.
+        """
+        if height < 1:
+            return
+        if filled:
+            segments = [(a0, b, a1, b) for b, a0, a1 in voxels.discRuns(radius)]
+        else:
+            segments = voxels.circleSegments(radius)
+        # one setBlocks per run of the base, spanning the whole height
+        self._drawCuboids(x0, y, z0, [(a0, 0, b0, a1, height - 1, b1) for a0, b0, a1, b1 in segments],
+                          blockType, blockData)
 
-        f = 1 - radius
-        ddf_x = 1
-        ddf_z = -2 * radius
-        x = 0
-        z = radius
-        self.drawPoint3d(x0, y, z0 + radius, blockType, blockData)
-        self.drawPoint3d(x0, y, z0 - radius, blockType, blockData)
-        self.drawPoint3d(x0 + radius, y, z0, blockType, blockData)
-        self.drawPoint3d(x0 - radius, y, z0, blockType, blockData)
-     
-        while x < z:
-            if f >= 0:
-                z -= 1
-                ddf_z += 2
-                f += ddf_z
-            x += 1
-            ddf_x += 2
-            f += ddf_x   
-            self.drawPoint3d(x0 + x, y, z0 + z, blockType, blockData)
-            self.drawPoint3d(x0 - x, y, z0 + z, blockType, blockData)
-            self.drawPoint3d(x0 + x, y, z0 - z, blockType, blockData)
-            self.drawPoint3d(x0 - x, y, z0 - z, blockType, blockData)
-            self.drawPoint3d(x0 + z, y, z0 + x, blockType, blockData)
-            self.drawPoint3d(x0 - z, y, z0 + x, blockType, blockData)
-            self.drawPoint3d(x0 + z, y, z0 - x, blockType, blockData)
-            self.drawPoint3d(x0 - z, y, z0 - x, blockType, blockData)
-    
     def getLine(self, x1, y1, z1, x2, y2, z2):
         """
         Returns all the points which would make up a line between 2 points as a list
 
+        3d implementation of bresenham line algorithm, see ``iterLine``
+
+        :param int x1:
+            The x position of the first point.
+
+        :param int y1:
+            The y position of the first point.
+
+        :param int z1:
+            The z position of the first point.
+
+        :param int x2:
+            The x position of the second point.
+
+        :param int y2:
+            The y position of the second point.
+
+        :param int z2:
+            The z position of the second point.
+        """
+        return [minecraft.Vec3(x, y, z) for x, y, z in self.iterLine(x1, y1, z1, x2, y2, z2)]
+
+    def iterLine(self, x1, y1, z1, x2, y2, z2):
+        """
+        Yields the points which make up a line between 2 points as (x, y, z)
+        tuples, one at a time
+
         3d implementation of bresenham line algorithm
 
         :param int x1:
@@ -379,12 +463,9 @@ class MinecraftDrawing:
             elif a > 0: return 1
             elif a == 0: return 0
 
-        # list for vertices
-        vertices = []
-
         # if the 2 points are the same, return single vertice
         if (x1 == x2 and y1 == y2 and z1 == z2):
-            vertices.append(minecraft.Vec3(x1, y1, z1))
+            yield (x1, y1, z1)
                             
         # else get all points in edge
         else:
@@ -411,7 +492,7 @@ class MinecraftDrawing:
                 zd = az - (ax >> 1)
                 loop = True
                 while(loop):
-                    vertices.append(minecraft.Vec3(x, y, z))
+                    yield (x, y, z)
                     if (x == x2):
                         loop = False
                     if (yd >= 0):
@@ -429,7 +510,7 @@ class MinecraftDrawing:
                 zd = az - (ay >> 1)
                 loop = True
                 while(loop):
-                    vertices.append(minecraft.Vec3(x, y, z))
+                    yield (x, y, z)
                     if (y == y2):
                         loop=False
                     if (xd >= 0):
@@ -447,7 +528,7 @@ class MinecraftDrawing:
                 yd = ay - (az >> 1)
                 loop = True
                 while(loop):
-                    vertices.append(minecraft.Vec3(x, y, z))
+                    yield (x, y, z)
                     if (z == z2):
                         loop=False
                     if (xd >= 0):
@@ -459,8 +540,6 @@ class MinecraftDrawing:
                     z += sz
                     xd += ax
                     yd += ay
-                    
-        return vertices
 
 # MinecraftShape - a class for managing shapes
 class MinecraftShape:
@@ -493,16 +572,33 @@ class MinecraftShape:
         self.originalPos = self.position.clone()
         
         if shapeBlocks == None:
-            self.shapeBlocks = []
+            self._shapeBlocks = []
         else:
-            self.shapeBlocks = shapeBlocks
+            self._shapeBlocks = shapeBlocks
 
         self.visible = visible
 
         #setup properties
 
         #drawnShapeBlocks is the last positions the shape was drawn too
-        self.drawnShapeBlocks = None
+        self._drawnShapeBlocks = None
+
+        #with numpy the positions of the blocks are also kept as Vec3Arrays,
+        # moved and rotated all at once, and the ShapeBlocks are only updated
+        # from them when they are asked for (see _sync)
+        self._origins = None
+        self._relative = None
+        self._actual = None
+        self._stale = False
+        #the rows which were last drawn, with the blocks they came from
+        self._drawn = None
+
+        #shapeBlocks indexed by original and by actual position, the first
+        # block wins when 2 share a position, as in a scan of the list
+        self._byOriginalPos = {}
+        self._byActualPos = {}
+        self._indexed = None
+        self._indexedCount = 0
 
         #set yaw, pitch, roll
         self.yaw, self.pitch, self.roll = 0, 0, 0
@@ -510,11 +606,47 @@ class MinecraftShape:
         #move the shape to its starting position
         self._move(position.x, position.y, position.z)
 
+    @property
+    def shapeBlocks(self):
+        """
+        the list of ShapeBlocks which make up the shape
+        """
+        self._sync()
+        return self._shapeBlocks
+
+    @shapeBlocks.setter
+    def shapeBlocks(self, shapeBlocks):
+        self._sync()
+        self._shapeBlocks = shapeBlocks
+
+    @property
+    def drawnShapeBlocks(self):
+        """
+        copies of the ShapeBlocks as they were last drawn, ``None`` if the shape isn't drawn
+        """
+        if self._drawnShapeBlocks is None and self._drawn is not None:
+            rows, relative, shapeBlocks = self._drawn
+            self._drawnShapeBlocks = []
+            for row, relativePos, shapeBlock in zip(rows.tolist(), relative.tolist(), shapeBlocks):
+                newShapeBlock = ShapeBlock(*row, tag = shapeBlock.tag)
+                newShapeBlock.originalPos = shapeBlock.originalPos.clone()
+                newShapeBlock.relativePos = minecraft.Vec3(*relativePos)
+                self._drawnShapeBlocks.append(newShapeBlock)
+        return self._drawnShapeBlocks
+
+    @drawnShapeBlocks.setter
+    def drawnShapeBlocks(self, shapeBlocks):
+        self._drawnShapeBlocks = shapeBlocks
+        self._drawn = None
+
     def draw(self):
         """
         draws the shape in Minecraft, taking into account where it was last drawn, 
         only updating the blocks which have changed
         """
+        if numpy is not None:
+            self._drawRows()
+            return
 
         #create 2 sets only of the blocks which are drawn and one of the shapeBlocks
         if self.drawnShapeBlocks == None:
@@ -523,31 +655,81 @@ class MinecraftShape:
             drawnSet = set(self.drawnShapeBlocks)
         currentSet = set(self.shapeBlocks)
         
-        #work out the blocks which need to be cleared
-        for blockToClear in drawnSet - currentSet:
-            self.mc.setBlock(blockToClear.actualPos.x, blockToClear.actualPos.y, blockToClear.actualPos.z, block.AIR.id)
+        #the changes are merged into cuboids; they already are only what
+        # changed since the last draw, so the world isn't read back
+        with EditBatch(self.mc) as batch:
+            #work out the blocks which need to be cleared
+            for blockToClear in drawnSet - currentSet:
+                batch.setBlock(blockToClear.actualPos.x, blockToClear.actualPos.y, blockToClear.actualPos.z, block.AIR.id)
 
-        #work out the blocks which have changed and need to be re-drawn
-        for blockToDraw in currentSet - drawnSet:
-            self.mc.setBlock(blockToDraw.actualPos.x, blockToDraw.actualPos.y, blockToDraw.actualPos.z, blockToDraw.blockType, blockToDraw.blockData)
+            #work out the blocks which have changed and need to be re-drawn
+            for blockToDraw in currentSet - drawnSet:
+                batch.setBlock(blockToDraw.actualPos.x, blockToDraw.actualPos.y, blockToDraw.actualPos.z, blockToDraw.blockType, blockToDraw.blockData)
 
         #update the blocks which have been drawn
         self.drawnShapeBlocks = self._copyBlocks(self.shapeBlocks)
         self.visible = True
 
+    def _drawRows(self):
+        """
+        Internal. draw() with numpy, diffing the rows (x, y, z, type, data)
+        which were drawn against the current ones
+        """
+        rows, relative = self._rows()
+        drawn = self._drawnRows()
+        keys, drawnKeys = _rowKeys(rows), _rowKeys(drawn)
+        with EditBatch(self.mc) as batch:
+            #the blocks which need to be cleared
+            for x, y, z, _, _ in drawn[~numpy.isin(drawnKeys, keys)].tolist():
+                batch.setBlock(x, y, z, block.AIR.id)
+
+            #the blocks which have changed and need to be re-drawn
+            for x, y, z, blockType, blockData in rows[~numpy.isin(keys, drawnKeys)].tolist():
+                batch.setBlock(x, y, z, blockType, blockData)
+
+        self._setDrawn(rows, relative)
+        self.visible = True
+
+    def _setDrawn(self, rows = None, relative = None):
+        """
+        Internal. remember the blocks as they are now as the ones drawn
+        """
+        if numpy is not None:
+            if rows is None:
+                rows, relative = self._rows()
+            self._drawnShapeBlocks = None
+            self._drawn = (rows, relative, list(self._shapeBlocks))
+        else:
+            self.drawnShapeBlocks = self._copyBlocks(self.shapeBlocks)
+
+    def _drawnRows(self):
+        """
+        Internal. the drawn blocks as rows of x, y, z, type, data
+        """
+        if self._drawn is not None:
+            return self._drawn[0]
+        return _blockRows(self._drawnShapeBlocks or [])
+
+    def _drawnPositions(self):
+        """
+        Internal. the positions of the drawn blocks => [(x, y, z)]
+        """
+        if self._drawn is not None:
+            return self._drawn[0][:, :3].tolist()
+        return [(b.actualPos.x, b.actualPos.y, b.actualPos.z) for b in self._drawnShapeBlocks or []]
+
     def redraw(self):
         """
         redraws the shape in Minecraft, by clearing all the blocks and redrawing them 
         """
-        if self.drawnShapeBlocks != None:
-            for blockToClear in self.drawnShapeBlocks:
-                self.mc.setBlock(blockToClear.actualPos.x, blockToClear.actualPos.y, blockToClear.actualPos.z, block.AIR.id)
+        for x, y, z in self._drawnPositions():
+            self.mc.setBlock(x, y, z, block.AIR.id)
 
         for blockToDraw in self.shapeBlocks:
             self.mc.setBlock(blockToDraw.actualPos.x, blockToDraw.actualPos.y, blockToDraw.actualPos.z, blockToDraw.blockType, blockToDraw.blockData)
 
         #update the blocks which have been drawn
-        self.drawnShapeBlocks = self._copyBlocks(self.shapeBlocks)
+        self._setDrawn()
         self.visible = True
 
     def clear(self):
@@ -555,12 +737,9 @@ class MinecraftShape:
         clears the shape in Minecraft
         """
         #clear the shape
-        if self.drawnShapeBlocks != None:
-            for blockToClear in self.drawnShapeBlocks:
-                self.mc.setBlock(blockToClear.actualPos.x,
-                                 blockToClear.actualPos.y,
-                                 blockToClear.actualPos.z,
-                                 block.AIR.id)
+        if self._drawn is not None or self._drawnShapeBlocks is not None:
+            for x, y, z in self._drawnPositions():
+                self.mc.setBlock(x, y, z, block.AIR.id)
             self.drawnShapeBlocks = None
         
         self.visible = False
@@ -648,8 +827,87 @@ class MinecraftShape:
         """
         Internal. recalculate the position of all of the blocks in a shape
         """
+        if numpy is not None:
+            #the ShapeBlocks catch up when they are asked for
+            self._transform()
+            self._stale = True
+            return
         for shapeBlock in self.shapeBlocks:
             self._recalcBlock(shapeBlock)
+        self._index(True)
+
+    def _originArray(self):
+        """
+        Internal. the original positions of the shapeBlocks as a Vec3Array,
+        built again when blocks have been added
+        """
+        self._index()
+        if self._origins is None:
+            self._origins = Vec3Array([_posKey(b.originalPos) for b in self._shapeBlocks])
+        return self._origins
+
+    def _transform(self):
+        """
+        Internal. recalculate the relative and actual positions of all the
+        blocks at once, rounding after each rotation as _rotateShapeBlock does
+        """
+        self._relative = self._originArray().rotate(self.yaw, self.pitch, self.roll, rintEach = True)
+        self._actual = self._relative + (self.position.x, self.position.y, self.position.z)
+
+    def _rows(self):
+        """
+        Internal. the blocks as rows of x, y, z, type, data, and their
+        relative positions
+        """
+        shapeBlocks = self._shapeBlocks
+        if self._stale and len(self._actual) != len(shapeBlocks):
+            #blocks were added to the list since it was last moved
+            self._sync()
+        if self._stale:
+            actual, relative = self._actual.xyz, self._relative.xyz
+        else:
+            #the ShapeBlocks are up to date, and may have been changed
+            actual = numpy.array([_posKey(b.actualPos) for b in shapeBlocks]).reshape(-1, 3)
+            relative = numpy.array([_posKey(b.relativePos) for b in shapeBlocks]).reshape(-1, 3)
+        #read the blocks every time, a ShapeBlock's type can be set directly
+        materials = numpy.array([(b.blockType, b.blockData) for b in shapeBlocks]).reshape(-1, 2)
+        rows = numpy.column_stack((actual, materials))
+        if rows.dtype.kind != "i":
+            rows = numpy.floor(rows).astype(numpy.int64)
+        return rows, relative
+
+    def _sync(self):
+        """
+        Internal. update the positions of the ShapeBlocks from the Vec3Arrays
+        """
+        if not self._stale:
+            return
+        self._stale = False
+        for shapeBlock, relativePos, actualPos in zip(self._shapeBlocks, self._relative.xyz.tolist(),
+                                                      self._actual.xyz.tolist()):
+            shapeBlock.relativePos = minecraft.Vec3(*relativePos)
+            shapeBlock.actualPos.x, shapeBlock.actualPos.y, shapeBlock.actualPos.z = actualPos
+        self._index(True)
+
+    def _index(self, moved = False):
+        """
+        Internal. brings the position indexes up to date, rebuilding them if
+        shapeBlocks was replaced or changed in length outside of the shape,
+        and the actual positions one if the blocks have moved
+        """
+        shapeBlocks = self._shapeBlocks
+        if self._indexed is not shapeBlocks or self._indexedCount != len(shapeBlocks):
+            self._byOriginalPos = {}
+            for shapeBlock in shapeBlocks:
+                self._byOriginalPos.setdefault(_posKey(shapeBlock.originalPos), shapeBlock)
+            self._origins = None
+            moved = True
+        if moved:
+            self._byActualPos = {}
+            for shapeBlock in shapeBlocks:
+                self._byActualPos.setdefault(_posKey(shapeBlock.actualPos), shapeBlock)
+        self._indexed = shapeBlocks
+        self._indexedCount = len(shapeBlocks)
             
     def _recalcBlock(self, shapeBlock):
         """
@@ -800,19 +1058,24 @@ class MinecraftShape:
         """
         sets one block in the shape 
         """
+        self._index()
         #does the block already exist?
-        for shapeBlock in self.shapeBlocks:
-            if shapeBlock.originalPos.x == x and shapeBlock.originalPos.y == y and shapeBlock.originalPos.z == z:
-                #it does exist, update it
-                shapeBlock.blockType = blockType
-                shapeBlock.blockData = blockData
-                shapeBlock.tag= tag
-                break
+        shapeBlock = self._byOriginalPos.get((x, y, z))
+        if shapeBlock is not None:
+            #it does exist, update it
+            shapeBlock.blockType = blockType
+            shapeBlock.blockData = blockData
+            shapeBlock.tag= tag
         else:
-            #it doesn't append it
+            #it doesn't append it, after the others have caught up
+            self._sync()
             newShapeBlock = ShapeBlock(x, y, z, blockType, blockData, tag)
             self._recalcBlock(newShapeBlock)
-            self.shapeBlocks.append(newShapeBlock)
+            self._shapeBlocks.append(newShapeBlock)
+            self._byOriginalPos[(x, y, z)] = newShapeBlock
+            self._byActualPos.setdefault(_posKey(newShapeBlock.actualPos), newShapeBlock)
+            self._indexedCount += 1
+            self._origins = None
 
     def setBlocks(self, x1, y1, z1, x2, y2, z2, blockType, blockData = 0, tag = ""):
         """
@@ -874,14 +1137,28 @@ class MinecraftShape:
         :param int z:
             The z position.
         """
-        #does the block exist?
-        for shapeBlock in self.shapeBlocks:
-            if shapeBlock.actualPos.x == x and shapeBlock.actualPos.y == y and shapeBlock.actualPos.z == z:
-                return shapeBlock
-        else:
-            #it doesn't return None
-            return None
+        #does the block exist? if it doesn't return None
+        self._sync()
+        self._index()
+        return self._byActualPos.get((x, y, z))
         
+def _posKey(pos):
+    """Internal. the (x,y,z) dictionary key of a Vec3"""
+    return (pos.x, pos.y, pos.z)
+
+def _blockRows(shapeBlocks):
+    """Internal. ShapeBlocks as a numpy array of rows x, y, z, type, data"""
+    rows = numpy.array([(b.actualPos.x, b.actualPos.y, b.actualPos.z, b.blockType, b.blockData)
+                        for b in shapeBlocks]).reshape(-1, 5)
+    if rows.dtype.kind != "i":
+        rows = numpy.floor(rows).astype(numpy.int64)
+    return rows
+
+def _rowKeys(rows):
+    """Internal. each row of an int array as one comparable value, for numpy.isin"""
+    rows = numpy.ascontiguousarray(rows, dtype=numpy.int64)
+    return rows.view(numpy.dtype((numpy.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+
 # a class created to manage a block within a shape
 class ShapeBlock():
     """
@@ -1028,11 +1305,15 @@ class MinecraftTurtle:
                 self.mcDrawing.drawLine(currentX, currentY - 1, currentZ, targetX, targetY - 1, targetZ, self._penblock.id, self._penblock.data)
         else:
             blocksBetween = self.mcDrawing.getLine(currentX, currentY, currentZ, targetX, targetY, targetZ)
+            # if walking, the y of every step is the height of the world,
+            # fetched for the whole line in one round trip
+            if not self.flying:
+                with self.mc.pipeline() as pipe:
+                    heights = [pipe.getHeight(blockBetween.x, blockBetween.z) for blockBetween in blocksBetween]
+                for blockBetween, height in zip(blocksBetween, heights):
+                    blockBetween.y = height.result()
             for blockBetween in blocksBetween:
                 # print blockBetween
-                # if walking update the y, to be the height of the world
-                if not self.flying:
-                    blockBetween.y = self.mc.getHeight(blockBetween.x, blockBetween.z)
                 # draw the turtle
                 if self.showturtle:
                     self._drawTurtle(blockBetween.x, blockBetween.y, blockBetween.z)
@@ -1266,3 +1547,54 @@ class MinecraftTurtle:
     def _roundVec3(position):
         return minecraft.vec3(int(position.x), int(position.y), int(position.z))
 
+
+def testShapeParity():
+    # MinecraftShape with numpy draws the same world as without it
+    global numpy
+    try:
+        from mcpi.localserver import LocalServer, World
+        from mcpi.connection import Connection
+    except ImportError:
+        from localserver import LocalServer, World
+        from connection import Connection
+
+    def scene(mc):
+        shape = MinecraftShape(mc, minecraft.Vec3(0, 100, 0), [ShapeBlock(0, 0, 0, 1, 0, "head")])
+        shape.setBlocks(-3, -2, -4, 3, 2, 4, 2, 1, "body")
+        shape.rotate(37, 20, 15)
+        shape.moveBy(1, 2, 3)
+        #a block changed directly is drawn with its new type
+        shape.shapeBlocks[1].blockType = 4
+        shape.draw()
+        shape.rotate(90, 0, 180)
+        #blocks added to the list are drawn where they are until the next move
+        shape.shapeBlocks.append(ShapeBlock(12, 0, 0, 5))
+        shape.draw()
+        shape.moveBy(-2, 0, 1)
+        shape.setBlock(6, 6, 6, 3, 2)
+        shape.shapeBlocks = shape.shapeBlocks[::2]
+        shape.draw()
+        shape.rotate(-45, 90, 0)
+        shape.clear()
+        shape.draw()
+        return [(b.actualPos.x, b.actualPos.y, b.actualPos.z, b.blockType, b.blockData) for b in shape.shapeBlocks]
+
+    hasNumpy = numpy
+    worlds, blocks = [], []
+    try:
+        for useNumpy in (hasNumpy, None):
+            numpy = useNumpy
+            world = World()
+            with LocalServer(port=0, world=world) as server:
+                mc = minecraft.Minecraft(Connection("localhost", server.port))
+                blocks.append(scene(mc))
+                #replies come in order, so every write has been applied
+                mc.getHeight(0, 0)
+                worlds.append(sorted(world.edits.items()))
+    finally:
+        numpy = hasNumpy
+    assert blocks[0] == blocks[1]
+    assert worlds[0] == worlds[1]
+
+if __name__ == "__main__":
+    testShapeParity()
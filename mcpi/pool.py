@@ -0,0 +1,84 @@
+import threading
+from contextlib import contextmanager
+from .connection import Connection
+
+class PoolExhausted(Exception):
+    pass
+
+class ConnectionPool:
+    """
+    A bounded pool of Connections to one Minecraft server.
+
+    Each lease gets a socket of its own, so agents (or concurrent operations)
+    never interleave requests and replies on a shared connection. Connections
+    are opened lazily, up to size, and reused once released. Extra keyword
+    options (bufferSize, flushInterval) are passed to every Connection.
+    """
+    def __init__(self, address = "localhost", port = 4711, size = 4, **options):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.address = address
+        self.port = port
+        self.size = size
+        self.options = options
+        self._idle = []
+        self._leased = set()
+        self._opening = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        return Connection(self.address, self.port, **self.options)
+
+    def acquire(self, timeout = None):
+        """Lease a connection, waiting up to timeout seconds for a free one => Connection"""
+        with self._cond:
+            if not self._cond.wait_for(self._available, timeout):
+                raise PoolExhausted("all %d connections are leased"%self.size)
+            if self._idle:
+                conn = self._idle.pop()
+                self._leased.add(conn)
+                return conn
+            # reserve the slot, the connect itself happens outside the lock
+            self._opening += 1
+        try:
+            conn = self._connect()
+        except BaseException:
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opening -= 1
+            self._leased.add(conn)
+        return conn
+
+    def _available(self):
+        return bool(self._idle) or len(self._leased) + self._opening < self.size
+
+    def release(self, conn):
+        """Return a leased connection to the pool"""
+        with self._cond:
+            self._leased.remove(conn)
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self, timeout = None):
+        """Context manager that leases a connection and always releases it"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close the idle connections, leased ones are closed on release"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
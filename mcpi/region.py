@@ -0,0 +1,174 @@
+from array import array
+from .block import Block
+from .connection import RequestError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def parseIds(raw, count=None):
+    """
+    Block ids of a world.getBlocks reply, as bytes (or str) => array('H')
+
+    With numpy the numbers are read straight from the reply in C, otherwise
+    with one split. count, when known, is checked against the reply. A
+    reply that isn't a list of ids in 0..65535 raises RequestError.
+    """
+    sep = b"," if isinstance(raw, bytes) else ","
+    # a trailing separator is tolerated
+    raw = raw.rstrip(sep)
+    n = raw.count(sep) + 1 if raw else 0
+    try:
+        if numpy is not None:
+            values = numpy.fromstring(raw, dtype=numpy.int64, sep=",")
+            # older numpy stops at a malformed number with only a warning
+            if len(values) != n or (n and (values.min() < 0 or values.max() > 0xFFFF)):
+                raise ValueError("not %d ids in 0..65535"%n)
+            ids = array("H", values.astype(numpy.uint16).tobytes())
+        else:
+            ids = array("H", map(int, raw.split(sep))) if raw else array("H")
+    except (ValueError, OverflowError) as e:
+        raise RequestError("malformed block ids in a reply: %s"%e) from e
+    if count is not None and len(ids) != count:
+        raise RequestError("%d block ids in a reply for %d blocks"%(len(ids), count))
+    return ids
+
+def parseIdsWithData(raw, count=None):
+    """Block ids and data of a world.getBlocksWithData reply (id,data|id,data...) => (array('H'), array('B'))"""
+    if isinstance(raw, bytes):
+        raw = raw.replace(b"|", b",")
+    else:
+        raw = raw.replace("|", ",")
+    pairs = parseIds(raw, count * 2 if count is not None else None)
+    return pairs[0::2], array("B", pairs[1::2])
+
+class Region:
+    """
+    A cuboid of block ids fetched with a single world.getBlocks.
+
+    The ids are kept in one flat array('H') in the server's order (y, then x,
+    then z), so point lookups are index arithmetic and asArray() can expose
+    the same memory as a 3-D NumPy array indexed [y, x, z] without copying.
+    Regions read with getBlocksWithData also keep the data values, in an
+    array('B') of the same layout.
+    """
+    def __init__(self, x0, y0, z0, x1, y1, z1, ids, data=None):
+        self.x0, self.x1 = min(x0, x1), max(x0, x1)
+        self.y0, self.y1 = min(y0, y1), max(y0, y1)
+        self.z0, self.z1 = min(z0, z1), max(z0, z1)
+        self.nx = self.x1 - self.x0 + 1
+        self.ny = self.y1 - self.y0 + 1
+        self.nz = self.z1 - self.z0 + 1
+        if len(ids) != self.nx * self.ny * self.nz:
+            raise ValueError("%d block ids for a %dx%dx%d region"%(len(ids), self.nx, self.ny, self.nz))
+        if data is not None and len(data) != len(ids):
+            raise ValueError("%d data values for %d blocks"%(len(data), len(ids)))
+        self.ids = ids
+        self.data = data
+
+    @staticmethod
+    def parse(x0, y0, z0, x1, y1, z1, s):
+        """Region from a world.getBlocks reply, bytes or str"""
+        count = (abs(x1 - x0) + 1) * (abs(y1 - y0) + 1) * (abs(z1 - z0) + 1)
+        return Region(x0, y0, z0, x1, y1, z1, parseIds(s, count))
+
+    @staticmethod
+    def parseWithData(x0, y0, z0, x1, y1, z1, s):
+        """Region from a world.getBlocksWithData reply, bytes or str"""
+        count = (abs(x1 - x0) + 1) * (abs(y1 - y0) + 1) * (abs(z1 - z0) + 1)
+        return Region(x0, y0, z0, x1, y1, z1, *parseIdsWithData(s, count))
+
+    @property
+    def shape(self):
+        """(ny, nx, nz), the shape of asArray()"""
+        return (self.ny, self.nx, self.nz)
+
+    def contains(self, x, y, z):
+        return (self.x0 <= x <= self.x1 and self.y0 <= y <= self.y1
+                and self.z0 <= z <= self.z1)
+
+    def _index(self, x, y, z):
+        if not self.contains(x, y, z):
+            raise IndexError("(%d,%d,%d) is outside the region"%(x, y, z))
+        return ((y - self.y0) * self.nx + (x - self.x0)) * self.nz + (z - self.z0)
+
+    def getBlock(self, x, y, z):
+        """Block id at world position (x,y,z) => id:int"""
+        return self.ids[self._index(x, y, z)]
+
+    def getBlockWithData(self, x, y, z):
+        """Block at world position (x,y,z) => Block, needs a region read with data"""
+        if self.data is None:
+            raise ValueError("the region was read without data values")
+        i = self._index(x, y, z)
+        return Block(self.ids[i], self.data[i])
+
+    def __iter__(self):
+        """Yields ((x,y,z), id) for every block of the region"""
+        i = 0
+        ids = self.ids
+        for y in range(self.y0, self.y1 + 1):
+            for x in range(self.x0, self.x1 + 1):
+                for z in range(self.z0, self.z1 + 1):
+                    yield (x, y, z), ids[i]
+                    i += 1
+
+    def asArray(self):
+        """The ids as a uint16 NumPy array indexed [y - y0, x - x0, z - z0] (no copy)"""
+        if numpy is None:
+            raise ImportError("Region.asArray() needs numpy")
+        return numpy.frombuffer(self.ids, dtype=numpy.uint16).reshape(self.shape)
+
+    def dataArray(self):
+        """The data values as a uint8 NumPy array shaped like asArray() (no copy)"""
+        if numpy is None:
+            raise ImportError("Region.dataArray() needs numpy")
+        if self.data is None:
+            raise ValueError("the region was read without data values")
+        return numpy.frombuffer(self.data, dtype=numpy.uint8).reshape(self.shape)
+
+class Heightmap:
+    """
+    World heights of a rectangle of columns, as returned by getHeights.
+
+    Heights are kept in a flat array('h') indexed by x, then z, and asArray()
+    exposes it as a 2-D NumPy array indexed [x - x0, z - z0] without copying.
+    """
+    def __init__(self, x0, z0, x1, z1, heights):
+        self.x0, self.x1 = min(x0, x1), max(x0, x1)
+        self.z0, self.z1 = min(z0, z1), max(z0, z1)
+        self.nx = self.x1 - self.x0 + 1
+        self.nz = self.z1 - self.z0 + 1
+        if len(heights) != self.nx * self.nz:
+            raise ValueError("%d heights for %dx%d columns"%(len(heights), self.nx, self.nz))
+        self.heights = heights
+
+    @property
+    def shape(self):
+        """(nx, nz), the shape of asArray()"""
+        return (self.nx, self.nz)
+
+    def contains(self, x, z):
+        return self.x0 <= x <= self.x1 and self.z0 <= z <= self.z1
+
+    def getHeight(self, x, z):
+        """Height of the column at world position (x,z) => int"""
+        if not self.contains(x, z):
+            raise IndexError("(%d,%d) is outside the heightmap"%(x, z))
+        return self.heights[(x - self.x0) * self.nz + (z - self.z0)]
+
+    def __iter__(self):
+        """Yields ((x,z), height) for every column"""
+        i = 0
+        heights = self.heights
+        for x in range(self.x0, self.x1 + 1):
+            for z in range(self.z0, self.z1 + 1):
+                yield (x, z), heights[i]
+                i += 1
+
+    def asArray(self):
+        """The heights as an int16 NumPy array indexed [x - x0, z - z0] (no copy)"""
+        if numpy is None:
+            raise ImportError("Heightmap.asArray() needs numpy")
+        return numpy.frombuffer(self.heights, dtype=numpy.int16).reshape(self.shape)
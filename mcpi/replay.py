@@ -0,0 +1,132 @@
+import collections
+import gzip
+import threading
+import time
+from .connection import Connection
+
+""" Record and replay of the mcpi wire traffic.
+
+    A Recorder passed to Connection(recorder=...) writes every request and
+    reply to a file. A ReplayConnection later answers the same requests from
+    that file, without a server, so agents and strategies can be re-run with
+    the network taken out of the measurement:
+
+        conn = Connection(address, port, recorder=Recorder("session.mcpi.gz"))
+        ...
+        mc = Minecraft(ReplayConnection("session.mcpi.gz"))
+
+    File format, one event per line (gzip compressed if the name ends in .gz):
+        ? <ms> <request>   request that expects a reply
+        > <ms> <request>   command without a reply
+        < <ms> <reply>     reply, paired in order with the ? lines
+    where ms is the time since the recording started.
+"""
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="cp437", newline="\n")
+    return open(path, mode, encoding="cp437", newline="\n")
+
+class Recorder:
+    """Writes the traffic of one Connection to a recording file"""
+    def __init__(self, path):
+        self.path = path
+        self._file = _open(path, "w")
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def _write(self, kind, line):
+        ms = (time.perf_counter() - self._start) * 1000
+        with self._lock:
+            if self._file is not None:
+                self._file.write("%s %.3f %s\n" % (kind, ms, line))
+
+    def sent(self, s, requests):
+        """Records one socket write, requests are its lines that expect a reply"""
+        requests = collections.deque(requests)
+        # only b"\n" ends a line: chat text may hold a \r
+        for line in s.split(b"\n")[:-1]:
+            line += b"\n"
+            if requests and line == requests[0]:
+                requests.popleft()
+                self._write("?", line[:-1].decode("cp437"))
+            else:
+                self._write(">", line.rstrip(b"\n").decode("cp437"))
+
+    def watch(self, futures):
+        """Records the replies resolving futures, as they arrive"""
+        for future in futures:
+            future.add_done_callback(self._replied)
+
+    def _replied(self, future):
+        if future.exception() is None:
+            reply = future.result()
+            self._write("<", reply if isinstance(reply, str) else reply.decode("cp437"))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def load(path):
+    """Reads a recording => ({request: [reply]}, [(kind, ms, line)])"""
+    replies = collections.defaultdict(list)
+    events = []
+    asked = collections.deque()
+    with _open(path, "r") as f:
+        for line in f:
+            kind, ms, text = line.rstrip("\n").split(" ", 2)
+            events.append((kind, float(ms), text))
+            if kind == "?":
+                asked.append(text)
+            elif kind == "<" and asked:
+                replies[asked.popleft()].append(text)
+    return dict(replies), events
+
+class ReplayConnection(Connection):
+    """
+    A Connection that answers from a recording instead of a server.
+
+    Each request gets the replies recorded for the very same request line,
+    in order, and then the last of them again. Requests never seen get
+    "Fail" (a RequestError) and are counted in misses. Commands without a
+    reply are only counted.
+    """
+    def __init__(self, path, stats=None):
+        self.socket = None
+        self._setup(0, 0, stats, None)
+        recorded, self.events = load(path)
+        self._replies = {request.encode("cp437"): collections.deque(answers)
+                         for request, answers in recorded.items()}
+        self._last = {}
+        self.misses = 0
+        self.sentLines = 0
+
+    @property
+    def recordedSeconds(self):
+        """Wall time of the recorded session"""
+        return self.events[-1][1] / 1000 if self.events else 0.0
+
+    def _send(self, s, requests=()):
+        self.lastSent = s
+        self.sentLines += s.count(b"\n")
+        if self.stats is not None:
+            self.stats.sent(s)
+        for request in requests:
+            future, raw = self._waiting.popleft()
+            reply = self._replyTo(request[:-1])
+            future.set_result(reply.encode("cp437") if raw else reply)
+
+    def _replyTo(self, request):
+        answers = self._replies.get(request)
+        if answers:
+            reply = self._last[request] = answers.popleft()
+            return reply
+        if request in self._last:
+            return self._last[request]
+        self.misses += 1
+        return Connection.RequestFailed
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,126 @@
+import math
+import threading
+import time
+
+class LatencyHistogram:
+    """
+    Log-scale latency histogram with fixed memory.
+
+    Bucket i holds samples up to Base * Growth**i seconds, so percentiles are
+    accurate to about 10% whatever the number of samples.
+    """
+    Base = 1e-5
+    Growth = 2 ** 0.25
+    Buckets = 96
+
+    def __init__(self):
+        self.counts = [0] * LatencyHistogram.Buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds <= LatencyHistogram.Base:
+            i = 0
+        else:
+            i = min(int(math.ceil(math.log(seconds / LatencyHistogram.Base, LatencyHistogram.Growth))),
+                    LatencyHistogram.Buckets - 1)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile => seconds"""
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(LatencyHistogram.Base * LatencyHistogram.Growth ** i, self.max)
+        return self.max
+
+class CommandStats:
+    """Counters of one command prefix, e.g. world.getBlock"""
+    def __init__(self):
+        self.calls = 0
+        self.replies = 0
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.latency = LatencyHistogram()
+
+    def snapshot(self):
+        h = self.latency
+        return {
+            "calls": self.calls,
+            "replies": self.replies,
+            "bytesSent": self.bytesSent,
+            "bytesReceived": self.bytesReceived,
+            "meanMs": h.total / h.count * 1000 if h.count else 0.0,
+            "p50Ms": h.percentile(50) * 1000,
+            "p95Ms": h.percentile(95) * 1000,
+            "p99Ms": h.percentile(99) * 1000,
+            "maxMs": h.max * 1000,
+        }
+
+class ConnectionStats:
+    """
+    Opt-in instrumentation of the mcpi wire traffic, per command prefix.
+
+    Pass an instance to Connection (or to every connection of a
+    ConnectionPool to aggregate them) and read it back with snapshot().
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commands = {}
+        self.unexpected = 0
+        self.started = time.monotonic()
+
+    def _command(self, name):
+        stats = self.commands.get(name)
+        if stats is None:
+            stats = self.commands[name] = CommandStats()
+        return stats
+
+    def sent(self, s):
+        """Records the request lines of one socket write"""
+        with self._lock:
+            for line in s.splitlines():
+                stats = self._command(commandName(line))
+                stats.calls += 1
+                stats.bytesSent += len(line) + 1
+
+    def replied(self, name, line, seconds):
+        """Records a reply of name, received seconds after its request"""
+        with self._lock:
+            stats = self._command(name)
+            stats.replies += 1
+            stats.bytesReceived += len(line) + 1
+            stats.latency.add(seconds)
+
+    def unexpectedLine(self):
+        with self._lock:
+            self.unexpected += 1
+
+    def snapshot(self):
+        """Current figures => {"elapsed", "unexpected", "commands": {name: {...}}}"""
+        with self._lock:
+            return {
+                "elapsed": time.monotonic() - self.started,
+                "unexpected": self.unexpected,
+                "commands": {name: stats.snapshot() for name, stats in sorted(self.commands.items())},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.commands = {}
+            self.unexpected = 0
+            self.started = time.monotonic()
+
+def commandName(line):
+    """The command prefix of a request line, b"world.getBlock(1,2,3)" => "world.getBlock" """
+    end = line.find(b"(")
+    return (line[:end] if end >= 0 else line).decode("cp437")
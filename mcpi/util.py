@@ -9,7 +9,31 @@ def flatten(l):
             for ee in flatten(e): yield ee
         else: yield e
 
+def flat_ints(l):
+    """
+    l, or its only item, when it is a flat list or tuple of ints, else None.
+
+    Most commands are sent with int coordinates (see minecraft.intFloor),
+    which this recognises without flattening them recursively.
+    """
+    if len(l) == 1 and type(l[0]) in (list, tuple):
+        l = l[0]
+    for e in l:
+        if type(e) is not int:
+            return None
+    return l
+
+# b"%d,%d,...%d" for each number of ints encoded so far
+_int_formats = {}
+
 def flatten_parameters_to_bytestring(l):
+    ints = flat_ints(l)
+    if ints is not None:
+        # one bytes formatting for the whole line instead of str() + encode per item
+        fmt = _int_formats.get(len(ints))
+        if fmt is None:
+            fmt = _int_formats[len(ints)] = b",".join([b"%d"] * len(ints))
+        return fmt % tuple(ints)
     return b",".join(map(_misc_to_bytes, flatten(l)))
 
 def _misc_to_bytes(m):
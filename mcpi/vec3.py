@@ -1,4 +1,13 @@
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 class Vec3:
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, x=0, y=0, z=0):
         self.x = x
         self.y = y
@@ -76,6 +85,135 @@ class Vec3:
     def rotateLeft(self):  self.x, self.z = self.z, -self.x
     def rotateRight(self): self.x, self.z = -self.z, self.x
 
+class Vec3Array:
+    """
+    N points as one contiguous (N, 3) NumPy array, for bulk coordinate math.
+
+    Arithmetic works with another Vec3Array of the same length, a Vec3 or
+    an (x, y, z) tuple (added to every point) and scalars. Results are new
+    arrays; the integer arrays from rint()/floor() are what setBlock needs.
+    Rotations follow MinecraftShape: yaw about y, roll about z, pitch about x,
+    in degrees.
+    """
+    __slots__ = ("xyz",)
+
+    def __init__(self, xyz=()):
+        if numpy is None:
+            raise ImportError("Vec3Array needs numpy")
+        xyz = numpy.asarray(xyz)
+        self.xyz = xyz.reshape(-1, 3) if xyz.size else numpy.zeros((0, 3), dtype=int)
+
+    @staticmethod
+    def fromVec3s(vecs):
+        """Vec3Array of a list of Vec3 (or (x,y,z) tuples)"""
+        return Vec3Array([tuple(v) for v in vecs])
+
+    def toVec3s(self):
+        """The points as a list of Vec3, with Python numbers"""
+        return [Vec3(x, y, z) for x, y, z in self.xyz.tolist()]
+
+    @property
+    def x(self):
+        return self.xyz[:, 0]
+
+    @property
+    def y(self):
+        return self.xyz[:, 1]
+
+    @property
+    def z(self):
+        return self.xyz[:, 2]
+
+    def __len__(self):
+        return len(self.xyz)
+
+    def __iter__(self):
+        return iter(self.toVec3s())
+
+    def __getitem__(self, i):
+        """A Vec3 for an int index, a Vec3Array for a slice or mask"""
+        if isinstance(i, (int, numpy.integer)):
+            return Vec3(*self.xyz[i].tolist())
+        return Vec3Array(self.xyz[i])
+
+    def __repr__(self):
+        return "Vec3Array(%s)"%self.xyz.tolist()
+
+    @staticmethod
+    def _operand(rhs):
+        if isinstance(rhs, Vec3Array):
+            return rhs.xyz
+        if isinstance(rhs, Vec3):
+            return numpy.array((rhs.x, rhs.y, rhs.z))
+        return numpy.asarray(rhs)
+
+    def __add__(self, rhs):
+        return Vec3Array(self.xyz + Vec3Array._operand(rhs))
+
+    def __sub__(self, rhs):
+        return Vec3Array(self.xyz - Vec3Array._operand(rhs))
+
+    def __mul__(self, k):
+        return Vec3Array(self.xyz * k)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Vec3Array(-self.xyz)
+
+    def __eq__(self, rhs):
+        return isinstance(rhs, Vec3Array) and numpy.array_equal(self.xyz, rhs.xyz)
+
+    def rint(self):
+        """Rounded to ints, halves to even like Python's round()"""
+        return Vec3Array(numpy.rint(self.xyz).astype(numpy.int64))
+
+    def floor(self):
+        """Rounded down to ints, like int(math.floor(v))"""
+        return Vec3Array(numpy.floor(self.xyz).astype(numpy.int64))
+
+    def bounds(self):
+        """The corners of the bounding box => (Vec3 min, Vec3 max)"""
+        if not len(self.xyz):
+            raise ValueError("bounds of an empty Vec3Array")
+        return (Vec3(*self.xyz.min(axis=0).tolist()), Vec3(*self.xyz.max(axis=0).tolist()))
+
+    @staticmethod
+    def rotationMatrix(axis, theta):
+        """3x3 matrix rotating theta degrees about axis "x", "y" or "z" """
+        s, c = math.sin(math.radians(theta)), math.cos(math.radians(theta))
+        if axis == "y":
+            return numpy.array([[c, 0, -s], [0, 1, 0], [s, 0, c]])
+        if axis == "z":
+            return numpy.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])
+        if axis == "x":
+            return numpy.array([[1, 0, 0], [0, c, -s], [0, s, c]])
+        raise ValueError("axis must be x, y or z, not %r"%(axis,))
+
+    def transform(self, matrix):
+        """Every point multiplied by a 3x3 matrix"""
+        return Vec3Array(self.xyz @ numpy.asarray(matrix).T)
+
+    def rotate(self, yaw=0, pitch=0, roll=0, rintEach=False):
+        """
+        Rotated by yaw, then roll, then pitch. rintEach=True rounds the 2
+        coordinates each rotation moves, as MinecraftShape does for its
+        blocks, and integer arrays stay integer.
+        """
+        xyz = self.xyz
+        for axis, theta in (("y", yaw), ("z", roll), ("x", pitch)):
+            if theta != 0:
+                rotated = xyz @ Vec3Array.rotationMatrix(axis, theta).T
+                if rintEach:
+                    kept = "xyz".index(axis)
+                    moved = [i for i in range(3) if i != kept]
+                    rotated[:, moved] = numpy.rint(rotated[:, moved])
+                    rotated[:, kept] = xyz[:, kept]
+                    if xyz.dtype.kind in "iu":
+                        rotated = rotated.astype(numpy.int64)
+                xyz = rotated
+        return Vec3Array(xyz)
+
 def testVec3():
     # Note: It's not testing everything
 
@@ -110,5 +248,29 @@ def testVec3():
     e = eval(repr(it))
     assert e == it
 
+def testVec3Array():
+    # rotate(rintEach=True) lands where MinecraftShape's per block rotation does
+    def rotate(a, b, theta):
+        if theta == 0:
+            return a, b
+        sin_t = math.sin(math.radians(theta))
+        cos_t = math.cos(math.radians(theta))
+        return int(round(a * cos_t - b * sin_t, 0)), int(round(b * cos_t + a * sin_t, 0))
+
+    points = [(x, y, z) for x in range(-6, 7) for y in range(-6, 7) for z in range(-6, 7)]
+    for yaw, pitch, roll in ((45, 0, 0), (0, 30, 0), (0, 0, 60), (37, 20, 15), (90, 90, 180), (-137, 45, 22.5)):
+        rotated = Vec3Array(points).rotate(yaw, pitch, roll, rintEach=True)
+        assert rotated.xyz.dtype.kind == "i"
+        for (x, y, z), got in zip(points, rotated.xyz.tolist()):
+            x, z = rotate(x, z, yaw)
+            x, y = rotate(x, y, roll)
+            y, z = rotate(y, z, pitch)
+            assert got == [x, y, z]
+
+    # axes no rotation touches keep their value, as on a block
+    assert Vec3Array([(1, 1.5, 0)]).rotate(yaw=90, rintEach=True).xyz.tolist() == [[0.0, 1.5, 1.0]]
+
 if __name__ == "__main__":
     testVec3()
+    if numpy is not None:
+        testVec3Array()
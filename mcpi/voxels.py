@@ -0,0 +1,184 @@
+import functools
+import math
+
+""" Voxelization of round shapes into cuboids for world.setBlocks.
+
+    Instead of testing every cell of the bounding box, each row of a shape
+    is solved analytically for the range of cells inside it, and runs of
+    rows with the same range are merged, across x and then across layers.
+    Cuboids are relative to the centre, (x0,y0,z0,x1,y1,z1) with inclusive
+    corners, and memoized.
+"""
+
+def _rowRanges(m, lo=None):
+    """
+    The z ranges of a row where z*z < m (and z*z > lo, for shells) => ((z0, z1), ...)
+    """
+    if m <= 0:
+        return ()
+    k = math.isqrt(m - 1)
+    if lo is None or lo < 0:
+        return ((-k, k),)
+    j = math.isqrt(lo) + 1
+    if j > k:
+        return ()
+    return ((-k, -j), (j, k))
+
+@functools.lru_cache(maxsize=64)
+def sphereCuboids(radius, hollow=False):
+    """
+    Cuboids of the cells (x,y,z), each in [-radius, radius), with
+    x*x + y*y + z*z < radius*radius, and for a hollow sphere also
+    > radius*radius - 2*radius (the cells MinecraftDrawing.drawSphere and
+    drawHollowSphere fill) => ((x0,y0,z0,x1,y1,z1), ...)
+    """
+    r2 = radius * radius
+    cuboids = []
+    # cuboids reaching the previous layer, by (x0, x1, z0, z1): a run with
+    # the same footprint one layer up extends them instead of starting anew
+    below = {}
+    for y in range(-radius, radius):
+        layer = {}
+        start, ranges = None, ()
+        for x in range(-radius, radius + 1):
+            # x == radius closes the last run
+            if x < radius:
+                m = r2 - x * x - y * y
+                rowRanges = _rowRanges(m, m - 2 * radius if hollow else None)
+            else:
+                rowRanges = ()
+            if rowRanges != ranges:
+                for z0, z1 in ranges:
+                    footprint = (start, x - 1, z0, z1)
+                    i = below.get(footprint)
+                    if i is None:
+                        i = len(cuboids)
+                        cuboids.append([start, y, z0, x - 1, y, z1])
+                    else:
+                        cuboids[i][4] = y
+                    layer[footprint] = i
+                start, ranges = x, rowRanges
+        below = layer
+    return tuple(tuple(cuboid) for cuboid in cuboids)
+
+def polygonCells(vertices):
+    """
+    Cells inside a planar polygon of (x,y,z) vertices => {(x,y,z)}
+
+    The polygon is projected on the coordinate plane it faces most
+    (dropping the axis of the largest normal component), filled there row
+    by row with the even-odd rule and lifted back on its plane. Each cell
+    appears once. The edges themselves are left to the caller (getLine).
+    """
+    n = len(vertices)
+    if n < 3:
+        return set()
+    # Newell's normal, also fine for concave or slightly non planar polygons
+    normal = [0, 0, 0]
+    for i in range(n):
+        p, q = vertices[i], vertices[(i + 1) % n]
+        normal[0] += (p[1] - q[1]) * (p[2] + q[2])
+        normal[1] += (p[2] - q[2]) * (p[0] + q[0])
+        normal[2] += (p[0] - q[0]) * (p[1] + q[1])
+    w = max(range(3), key=lambda axis: abs(normal[axis]))
+    if normal[w] == 0:
+        # collinear vertices: the edges are all there is
+        return set()
+    u, v = [axis for axis in range(3) if axis != w]
+    d = sum(normal[0] * p[0] + normal[1] * p[1] + normal[2] * p[2] for p in vertices) / n
+    edges = [(vertices[i], vertices[(i + 1) % n]) for i in range(n)]
+    cells = set()
+    vs = [p[v] for p in vertices]
+    for row in range(math.ceil(min(vs)), math.floor(max(vs)) + 1):
+        crossings = []
+        for p, q in edges:
+            if (p[v] <= row < q[v]) or (q[v] <= row < p[v]):
+                crossings.append(p[u] + (row - p[v]) * (q[u] - p[u]) / (q[v] - p[v]))
+        crossings.sort()
+        for a, b in zip(crossings[0::2], crossings[1::2]):
+            for col in range(math.ceil(a), math.floor(b) + 1):
+                cell = [0, 0, 0]
+                cell[u], cell[v] = col, row
+                cell[w] = math.floor((d - normal[u] * col - normal[v] * row) / normal[w] + 0.5)
+                cells.add(tuple(cell))
+    return cells
+
+@functools.lru_cache(maxsize=64)
+def circlePoints(radius):
+    """
+    Points (a,b) of a midpoint circle around (0,0), the ones
+    MinecraftDrawing.drawCircle draws => frozenset
+    """
+    points = {(0, radius), (0, -radius), (radius, 0), (-radius, 0)}
+    f = 1 - radius
+    ddf_x = 1
+    ddf_y = -2 * radius
+    x, y = 0, radius
+    while x < y:
+        if f >= 0:
+            y -= 1
+            ddf_y += 2
+            f += ddf_y
+        x += 1
+        ddf_x += 2
+        f += ddf_x
+        points.update(((x, y), (-x, y), (x, -y), (-x, -y),
+                       (y, x), (-y, x), (y, -x), (-y, -x)))
+    return frozenset(points)
+
+def _runs(cells):
+    """(b, a0, a1) runs of consecutive a in each row b of a set of (a,b)"""
+    runs = []
+    for a, b in sorted(cells, key=lambda cell: (cell[1], cell[0])):
+        if runs and runs[-1][0] == b and runs[-1][2] == a - 1:
+            runs[-1][2] = a
+        else:
+            runs.append([b, a, a])
+    return tuple(tuple(run) for run in runs)
+
+@functools.lru_cache(maxsize=64)
+def circleSegments(radius):
+    """
+    The points of circlePoints as straight segments => ((a0, b0, a1, b1), ...)
+
+    The flat top and bottom of the circle run along a, its sides along b.
+    """
+    points = circlePoints(radius)
+    rows = [(a, b) for a, b in points if abs(a) <= abs(b)]
+    columns = [(b, a) for a, b in points if abs(a) > abs(b)]
+    return (tuple((a0, b, a1, b) for b, a0, a1 in _runs(rows))
+            + tuple((a, b0, a, b1) for a, b0, b1 in _runs(columns)))
+
+@functools.lru_cache(maxsize=64)
+def discRuns(radius):
+    """A filled disc bounded by circlePoints, one run per row => ((b, a0, a1), ...)"""
+    rows = {}
+    for a, b in circlePoints(radius):
+        a0, a1 = rows.get(b, (a, a))
+        rows[b] = (min(a0, a), max(a1, a))
+    return tuple((b,) + rows[b] for b in sorted(rows))
+
+def pointRuns(points):
+    """
+    Consecutive (x,y,z) points one step apart along the same axis and in
+    the same direction, merged into straight segments
+    => [(x0,y0,z0,x1,y1,z1)]. Lazy inputs are fine.
+    """
+    runs = []
+    run = step = None
+    for point in points:
+        if run is not None:
+            last = run[3:]
+            axes = [i for i in range(3) if point[i] != last[i]]
+            if len(axes) == 1 and abs(point[axes[0]] - last[axes[0]]) == 1:
+                # (axis, direction), a turn or a step back starts a new run
+                pointStep = (axes[0], point[axes[0]] - last[axes[0]])
+                if step in (None, pointStep):
+                    run[3:] = point
+                    step = pointStep
+                    continue
+            runs.append(tuple(run))
+        run, step = list(point) * 2, None
+    if run is not None:
+        runs.append(tuple(run))
+    return runs
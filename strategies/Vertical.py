@@ -1,5 +1,6 @@
 from .MiningStrategy import MiningStrategy
 from mcpi.block import STONE, AIR
+from mcpi import edits
 import logging
 
 logger = logging.getLogger("VerticalMining")
@@ -27,35 +28,42 @@ class VerticalMining(MiningStrategy):
         blocs_minats = 0
         
         # 2. Minem cap avall des de la posició del jugador
-        # Busquem 10 blocs cap avall
-        for dy in range(0, 10):
-            target_y = start_y - dy
-            
-            # Evitem bedrock (y < 1)
-            if target_y < 1:
-                logger.warning(f"VerticalMining: Hem arribat a bedrock!")
-                break
+        # Busquem 10 blocs cap avall. Totes les consultes van en un sol
+        # viatge (pipeline) en lloc d'una anada i tornada per bloc
+        candidats = []
+        with mc.pipeline() as pipe:
+            for dy in range(0, 10):
+                target_y = start_y - dy
                 
-            pos_tuple = (start_x, target_y, start_z)
-            if pos_tuple in self.mined_positions:
-                logger.debug(f"VerticalMining: Posició ja minada: {pos_tuple}")
-                continue
-            
-            block_id = mc.getBlock(start_x, target_y, start_z)
+                # Evitem bedrock (y < 1)
+                if target_y < 1:
+                    logger.warning(f"VerticalMining: Hem arribat a bedrock!")
+                    break
+                    
+                pos_tuple = (start_x, target_y, start_z)
+                if pos_tuple in self.mined_positions:
+                    logger.debug(f"VerticalMining: Posició ja minada: {pos_tuple}")
+                    continue
+                
+                # getBlockWithData ja inclou l'id, no cal un getBlock previ
+                candidats.append((target_y, pos_tuple, pipe.getBlockWithData(start_x, target_y, start_z)))
+        
+        # Els blocs minats s'esborren junts: la columna surt en un sol setBlocks
+        esborrats = edits.EditBatch(mc)
+        for target_y, pos_tuple, resposta in candidats:
+            block_with_data = resposta.result()
+            block_id = block_with_data.id
             
             logger.info(f"VerticalMining: Comprovant bloc a ({start_x}, {target_y}, {start_z}): block_id={block_id}")
             
             if block_id == STONE.id:  # Només mina STONE
-                # Obtenim el bloc complet amb dades
-                block_with_data = mc.getBlockWithData(start_x, target_y, start_z)
-                
                 # Guardem el bloc a l'inventari (com a llista de blocs)
                 if "stone" not in bot.inventory:
                     bot.inventory["stone"] = []
                 bot.inventory["stone"].append(block_with_data)
                 
                 # Esborra el bloc del Minecraft
-                mc.setBlock(start_x, target_y, start_z, AIR)
+                esborrats.setBlock(start_x, target_y, start_z, AIR)
                 
                 # Marcar com minada
                 self.mined_positions.add(pos_tuple)
@@ -63,6 +71,8 @@ class VerticalMining(MiningStrategy):
                 blocs_minats += 1
                 logger.info(f"VerticalMining: Bloc minat! Inventory total: {len(bot.inventory['stone'])} pedres")
         
+        esborrats.flush()
+        
         # 3. Baixem la posició per a la propera iteració
         bot.mine_y -= 10
         logger.info(f"VerticalMining: S'han minat {blocs_minats} blocs. Noves coordenades: ({start_x}, {bot.mine_y}, {start_z})")
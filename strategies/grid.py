@@ -1,4 +1,5 @@
 from .MiningStrategy import MiningStrategy
+from mcpi import edits
 
 class GridMining(MiningStrategy):
     def execute(self, mc, bot):
@@ -6,12 +7,18 @@ class GridMining(MiningStrategy):
         pos = mc.player.getTilePos()
         size = 2  # Reixa de 2x2 al voltant
         
-        for dx in range(-size, size + 1):
-            for dz in range(-size, size + 1):
-                # Minem el bloc just a sota de la reixa
-                block_id = mc.getBlock(pos.x + dx, pos.y - 1, pos.z + dz)
-                if block_id != 0:
-                    mc.setBlock(pos.x + dx, pos.y - 1, pos.z + dz, 0)
-                    bot.inventory["cobblestone"] = bot.inventory.get("cobblestone", 0) + 1
+        # Llegim tota la capa de sota en un sol viatge (world.getBlocks)
+        capa = mc.getRegion(pos.x - size, pos.y - 1, pos.z - size,
+                            pos.x + size, pos.y - 1, pos.z + size)
+        
+        # Els blocs minats s'esborren junts, agrupats en cuboides
+        with edits.EditBatch(mc) as esborrats:
+            for dx in range(-size, size + 1):
+                for dz in range(-size, size + 1):
+                    # Minem el bloc just a sota de la reixa
+                    block_id = capa.getBlock(pos.x + dx, pos.y - 1, pos.z + dz)
+                    if block_id != 0:
+                        esborrats.setBlock(pos.x + dx, pos.y - 1, pos.z + dz, 0)
+                        bot.inventory["cobblestone"] = bot.inventory.get("cobblestone", 0) + 1
         
         return "SUCCESS"
\ No newline at end of file